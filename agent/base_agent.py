@@ -1,22 +1,48 @@
 """
-Agent 基类 - 提供默认的流式支持
+Agent 基类 - 提供默认的同步与流式支持
 """
+import asyncio
+import threading
+from functools import lru_cache
 from typing import Any, Dict, AsyncIterator
 from abc import ABC, abstractmethod
 
+# 默认 astream 模拟流式输出时每块的字符数
+_FAKE_STREAM_CHUNK_SIZE = 128
+
+
+@lru_cache(maxsize=1)
+def _get_sync_loop() -> asyncio.AbstractEventLoop:
+    """
+    获取（并缓存）同步 invoke 使用的后台事件循环
+
+    共享的 httpx.AsyncClient 连接池绑定在首次使用它的事件循环上，
+    每次 asyncio.run 新建循环会让后续调用复用已关闭循环上的连接而失败，
+    因此所有同步调用都提交到这个常驻循环上执行。
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="agent-sync-loop", daemon=True).start()
+    return loop
+
 
 class BaseAgent(ABC):
     """
-    Agent 基类，提供默认的流式支持。
+    Agent 基类，提供默认的同步与流式支持。
     
-    如果子类没有实现 astream，会自动使用 invoke 方法并模拟流式输出。
-    如果子类有 llm 属性，可以直接使用 llm.astream 进行流式输出。
+    子类只需实现异步的 ainvoke：
+    - invoke 默认在常驻的后台事件循环上执行 ainvoke（兼容同步调用方）
+    - 如果子类没有实现 astream，会自动使用 ainvoke 方法并模拟流式输出
+    - 如果子类有 llm 属性，可以直接使用 llm.astream 进行流式输出
     """
     
+    # 为 True 时，agent 会原地更新 inputs["chat_history"]（追加本轮 HumanMessage/AIMessage），
+    # 调用方不应再自行追加；为 False 时由调用方维护历史。
+    updates_history: bool = False
+    
     @abstractmethod
-    def invoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    async def ainvoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
-        执行一次对话（非流式）。
+        异步执行一次对话（非流式）。
         
         Args:
             inputs: 输入字典，包含 "input" 和可选的 "chat_history"
@@ -26,11 +52,26 @@ class BaseAgent(ABC):
         """
         pass
     
+    def invoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        同步执行一次对话（非流式）。
+        
+        默认实现把 ainvoke 提交到进程内常驻的后台事件循环并等待结果，仅用于同步场景；
+        在 FastAPI 等异步上下文中请直接 await ainvoke。
+        
+        Args:
+            inputs: 输入字典，包含 "input" 和可选的 "chat_history"
+        
+        Returns:
+            包含 "output" 和 "intermediate_steps" 的字典
+        """
+        return asyncio.run_coroutine_threadsafe(self.ainvoke(inputs), _get_sync_loop()).result()
+    
     async def astream(self, inputs: Dict[str, Any]) -> AsyncIterator[str]:
         """
         流式执行对话（默认实现）。
         
-        默认实现会调用 invoke 方法，然后模拟流式输出。
+        默认实现会调用 ainvoke 方法，然后模拟流式输出。
         子类可以覆盖此方法以实现真正的流式输出（如使用 llm.astream）。
         
         Args:
@@ -39,10 +80,10 @@ class BaseAgent(ABC):
         Yields:
             文本内容字符串
         """
-        # 默认：调用 invoke 然后模拟流式输出
-        result = self.invoke(inputs)
+        # 默认：调用 ainvoke 然后模拟流式输出
+        result = await self.ainvoke(inputs)
         output = result.get("output", "")
         
-        # 模拟流式输出（逐字符发送，可以改为逐词或逐句）
-        for char in output:
-            yield char
+        # 模拟流式输出：按固定大小分块发送，避免逐字符产生大量 SSE 帧
+        for i in range(0, len(output), _FAKE_STREAM_CHUNK_SIZE):
+            yield output[i:i + _FAKE_STREAM_CHUNK_SIZE]
@@ -1,19 +1,35 @@
 # agent/registry.py
-from typing import Callable, Dict
+from typing import Any, Callable, Dict, Optional
 
 # 注册表
 _AGENT_REGISTRY: Dict[str, Callable] = {}
 
+# 已创建的 agent 实例缓存：{name: instance}
+_AGENT_INSTANCES: Dict[str, Any] = {}
+
 def register_agent(name: str, factory: Callable):
     """注册一个 agent"""
     _AGENT_REGISTRY[name] = factory
+    # 重新注册时丢弃旧工厂创建的实例
+    _AGENT_INSTANCES.pop(name, None)
 
 def get_agent(name: str):
-    """获取 agent 实例"""
+    """获取 agent 实例（同名 agent 只创建一次，后续请求直接复用）"""
+    instance = _AGENT_INSTANCES.get(name)
+    if instance is not None:
+        return instance
     factory = _AGENT_REGISTRY.get(name)
     if not factory:
         raise ValueError(f"Agent '{name}' not found")
-    return factory()
+    instance = _AGENT_INSTANCES[name] = factory()
+    return instance
+
+def clear_agent_cache(name: Optional[str] = None):
+    """清除已缓存的 agent 实例（不传 name 时清除全部），主要用于测试"""
+    if name is None:
+        _AGENT_INSTANCES.clear()
+    else:
+        _AGENT_INSTANCES.pop(name, None)
 
 def list_agents():
     """列出所有可用 agent"""
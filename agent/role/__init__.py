@@ -3,6 +3,7 @@ agent.role 包
 
 用于放置不同“角色”的 Agent 实现，例如：
 - rag_agent.py  : 基于 RAG 的检索增强 Agent
+- tool_agent.py : 基于 OpenAI 工具调用的 Agent（支持并行工具调用）
 - langchain_agent.py : 使用 LangChain 官方 Agent 的通用 Agent
 
 各文件内部负责：
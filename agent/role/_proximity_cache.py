@@ -0,0 +1,86 @@
+"""
+近似检索缓存（Proximity 风格）。
+
+以 query embedding 为键缓存 rag_search 的检索结果：新问题与某个已缓存问题的
+余弦相似度不低于阈值时，直接复用其检索结果，省去一次向量库查询。
+
+所有缓存向量存放在一个预分配的 (maxsize, dim) 矩阵中，查找只需一次矩阵-向量乘法；
+容量满时淘汰最久未使用的条目（LRU）。
+"""
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+class ProximityCache:
+    """基于 embedding 余弦相似度的近似 LRU 缓存。"""
+
+    def __init__(self, maxsize: int = 1024, threshold: float = 0.95) -> None:
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._embeddings: Optional[np.ndarray] = None  # 首次写入时按维度分配
+        self._values: List[str] = []
+        self._last_used = np.zeros(maxsize, dtype=np.int64)
+        self._tick = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _touch(self, slot: int) -> None:
+        self._tick += 1
+        self._last_used[slot] = self._tick
+
+    def get(self, embedding: Sequence[float]) -> Optional[str]:
+        """
+        查找与 embedding 足够相近的缓存条目。
+
+        Returns:
+            命中时返回缓存的检索结果，否则返回 None
+        """
+        size = len(self._values)
+        if not size:
+            return None
+
+        query = self._normalize(embedding)
+        if query.shape[0] != self._embeddings.shape[1]:
+            return None
+
+        scores = self._embeddings[:size] @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        self._touch(best)
+        return self._values[best]
+
+    def put(self, embedding: Sequence[float], value: str) -> None:
+        """写入一条缓存，容量已满时覆盖最久未使用的条目。"""
+        vec = self._normalize(embedding)
+        if self._embeddings is None or self._embeddings.shape[1] != vec.shape[0]:
+            # 首次写入或 embedding 维度发生变化：重新分配存储
+            self._embeddings = np.zeros((self.maxsize, vec.shape[0]), dtype=np.float32)
+            self._values = []
+
+        size = len(self._values)
+        if size < self.maxsize:
+            slot = size
+            self._values.append(value)
+        else:
+            slot = int(np.argmin(self._last_used[:size]))
+            self._values[slot] = value
+
+        self._embeddings[slot] = vec
+        self._touch(slot)
+
+    def clear(self) -> None:
+        """清空缓存。"""
+        self._embeddings = None
+        self._values = []
+        self._last_used[:] = 0
+        self._tick = 0
@@ -7,7 +7,9 @@
 - 不依赖 langchain.agents 内部类型，避免版本兼容问题
 - 继承 BaseAgent 获得默认流式支持
 """
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import functools
 import os
 
 from dotenv import load_dotenv
@@ -17,60 +19,157 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 from agent.registry import register_agent
 from agent.base_agent import BaseAgent
+from app.utils.http_client import get_async_http_client
+from agent.role._proximity_cache import ProximityCache
 from app.utils.rag_tools import rag_search, get_document_details  # 仅作为工具使用
+from app.utils.rag_tools import embed_query, search_documents
 
 load_dotenv()
 
+# 并发上限：限制同时进行的检索（embedding + 向量库）与 LLM 调用数量，
+# 避免突发流量耗尽默认线程池、压垮数据库或触发 OpenAI 限流
+_RAG_SEM = asyncio.Semaphore(int(os.getenv("RAG_MAX_CONCURRENCY", "8")))
+_LLM_SEM = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "32")))
+
+# 检索到文档时的 system prompt 模板
+_HIT_TEMPLATE = (
+    "{system}\n\n"
+    "以下是检索到的相关文档内容，请优先基于这些内容回答问题：\n"
+    "{retrieved}\n\n"
+    "如果文档中仍然没有相关信息，请明确说明。"
+)
+
+# 未检索到文档时的 system prompt 模板
+_MISS_TEMPLATE = (
+    "{system}\n\n"
+    "未检索到与用户问题高度相关的文档内容，"
+    "请基于你已有的知识进行回答，并说明未找到相关文档。"
+)
+
+# 近似检索缓存：相近问题（query embedding 余弦相似度 >= 阈值）直接复用检索结果
+_RETRIEVAL_CACHE = ProximityCache(
+    maxsize=int(os.getenv("RAG_CACHE_SIZE", "1024")),
+    threshold=float(os.getenv("RAG_CACHE_THRESHOLD", "0.95")),
+)
+
 
 class RagAgent(BaseAgent):
-    """一个简单的 RAG Agent 封装，提供 .invoke() 接口。"""
+    """一个简单的 RAG Agent 封装，提供 .ainvoke() / .invoke() 接口。"""
+
+    # 直接在会话消息列表上追加本轮问答，调用方无需再更新历史
+    updates_history = True
 
     def __init__(self, llm: ChatOpenAI, system_prompt: str) -> None:
         self.llm = llm
         self.system_prompt = system_prompt
 
-    def invoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    def _build_system(self, retrieved: str) -> str:
+        """根据检索结果构造增强后的 system prompt。"""
+        if retrieved and retrieved != "未找到相关文档":
+            return _HIT_TEMPLATE.format(system=self.system_prompt, retrieved=retrieved)
+        return _MISS_TEMPLATE.format(system=self.system_prompt)
+
+    async def _retrieve(self, question: str) -> str:
+        """
+        检索与问题相关的文档（等价于 rag_search.run，但带近似缓存）。
+
+        先计算 query embedding 并查询缓存，未命中时才访问向量库；
+        embedding 与数据库查询都是阻塞调用，放到线程中执行。
+        """
+        try:
+            async with _RAG_SEM:
+                query_embedding = await asyncio.to_thread(embed_query, question)
+                cached = _RETRIEVAL_CACHE.get(query_embedding)
+                if cached is not None:
+                    return cached
+
+                retrieved = await asyncio.to_thread(search_documents, query_embedding)
+        except Exception as e:
+            return f"检索过程中发生错误: {str(e)}"
+
+        _RETRIEVAL_CACHE.put(query_embedding, retrieved)
+        return retrieved
+
+    def _begin_turn(self, history: List[Any], question: str) -> Tuple[int, HumanMessage]:
+        """
+        在会话消息列表上开始新一轮对话（原地修改）。
+
+        索引 0 固定保留给 system prompt（新会话时插入一次占位），
+        随后追加本轮的 HumanMessage，避免每轮按历史长度复制整个列表。
+        返回本轮 HumanMessage 在列表中的下标及消息对象本身。
+        """
+        if not history or not isinstance(history[0], SystemMessage):
+            history.insert(0, SystemMessage(content=self.system_prompt))
+        human_message = HumanMessage(content=question)
+        history.append(human_message)
+        return len(history) - 1, human_message
+
+    @staticmethod
+    def _end_turn(
+        history: List[Any],
+        base_system: SystemMessage,
+        turn: Tuple[int, HumanMessage],
+        answer: Optional[AIMessage],
+    ) -> None:
         """
-        执行一次对话。
+        结束本轮对话：恢复不含检索内容的 system prompt；
+        answer 为 None 表示本轮失败，按下标撤销本轮追加的问题。
+
+        消息按值比较，不能用 history.remove（会误删历史中内容相同的更早提问）。
+        """
+        history[0] = base_system
+        if answer is not None:
+            history.append(answer)
+            return
+        turn_index, human_message = turn
+        if turn_index < len(history) and history[turn_index] is human_message:
+            del history[turn_index]
+
+    async def ainvoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步执行一次对话。
+
+        检索的阻塞部分放到线程中执行；LLM 使用 ainvoke，
+        避免阻塞 FastAPI 事件循环。同步调用方可使用基类提供的 invoke。
 
         期望 inputs 结构：
         {
             "input": "用户问题",
-            "chat_history": [HumanMessage/AIMessage, ...]  # 可选
+            "chat_history": [SystemMessage, HumanMessage/AIMessage, ...]  # 可选
         }
+
+        chat_history 会被原地更新（见 updates_history）。
         """
         question: str = inputs.get("input", "")
-        chat_history: List[Any] = inputs.get("chat_history") or []
+        history: List[Any] = inputs.get("chat_history")
+        if history is None:
+            history = []
 
-        # 1. 使用 rag_search 工具检索相关文档
-        retrieved = rag_search.run(question)
+        # 1. 启动检索（embedding + 缓存 + 向量库），与消息组装并发进行
+        retrieval_task = asyncio.create_task(self._retrieve(question))
 
-        # 2. 构造增强后的 system prompt
-        if retrieved and retrieved != "未找到相关文档":
-            enhanced_system = (
-                f"{self.system_prompt}\n\n"
-                f"以下是检索到的相关文档内容，请优先基于这些内容回答问题：\n"
-                f"{retrieved}\n\n"
-                f"如果文档中仍然没有相关信息，请明确说明。"
-            )
-        else:
-            enhanced_system = (
-                f"{self.system_prompt}\n\n"
-                f"未检索到与用户问题高度相关的文档内容，"
-                f"请基于你已有的知识进行回答，并说明未找到相关文档。"
-            )
-
-        # 3. 组装消息：system + 历史 + 当前问题
-        messages: List[Any] = [SystemMessage(content=enhanced_system)]
-        messages.extend(chat_history)
-        messages.append(HumanMessage(content=question))
-
-        # 4. 调用 LLM
-        response = self.llm.invoke(messages)
-        if isinstance(response, AIMessage):
-            answer = response.content
-        else:
-            answer = getattr(response, "content", str(response))
+        # 2. 检索进行中先把当前问题追加到会话消息
+        turn = self._begin_turn(history, question)
+        base_system = history[0]
+
+        completed = False
+        try:
+            retrieved = await retrieval_task
+
+            # 3. 用增强后的 system prompt 替换索引 0（本轮结束后恢复）
+            history[0] = SystemMessage(content=self._build_system(retrieved))
+
+            # 4. 异步调用 LLM
+            async with _LLM_SEM:
+                response = await self.llm.ainvoke(history)
+            if isinstance(response, AIMessage):
+                answer = response.content
+            else:
+                answer = getattr(response, "content", str(response))
+            completed = True
+        finally:
+            # 本轮失败时撤销已追加的问题，保持历史为完整的问答对
+            self._end_turn(history, base_system, turn, AIMessage(content=answer) if completed else None)
 
         return {
             "output": answer,
@@ -90,49 +189,58 @@ class RagAgent(BaseAgent):
         期望 inputs 结构：
         {
             "input": "用户问题",
-            "chat_history": [HumanMessage/AIMessage, ...]  # 可选
+            "chat_history": [SystemMessage, HumanMessage/AIMessage, ...]  # 可选
         }
+
+        chat_history 会被原地更新（见 updates_history）。
         """
         question: str = inputs.get("input", "")
-        chat_history: List[Any] = inputs.get("chat_history") or []
+        history: List[Any] = inputs.get("chat_history")
+        if history is None:
+            history = []
 
-        # 1. 使用 rag_search 工具检索相关文档
-        retrieved = rag_search.run(question)
+        # 1. 启动检索（embedding + 缓存 + 向量库），与消息组装并发进行
+        retrieval_task = asyncio.create_task(self._retrieve(question))
 
-        # 2. 构造增强后的 system prompt
-        if retrieved and retrieved != "未找到相关文档":
-            enhanced_system = (
-                f"{self.system_prompt}\n\n"
-                f"以下是检索到的相关文档内容，请优先基于这些内容回答问题：\n"
-                f"{retrieved}\n\n"
-                f"如果文档中仍然没有相关信息，请明确说明。"
-            )
-        else:
-            enhanced_system = (
-                f"{self.system_prompt}\n\n"
-                f"未检索到与用户问题高度相关的文档内容，"
-                f"请基于你已有的知识进行回答，并说明未找到相关文档。"
-            )
-
-        # 3. 组装消息：system + 历史 + 当前问题
-        messages: List[Any] = [SystemMessage(content=enhanced_system)]
-        messages.extend(chat_history)
-        messages.append(HumanMessage(content=question))
-
-        # 4. 流式调用 LLM
-        async for chunk in self.llm.astream(messages):
-            if hasattr(chunk, 'content') and chunk.content:
-                content = chunk.content
-                yield content
+        # 2. 检索进行中先把当前问题追加到会话消息
+        turn = self._begin_turn(history, question)
+        base_system = history[0]
 
+        chunks: List[str] = []
+        completed = False
+        try:
+            retrieved = await retrieval_task
 
+            # 3. 用增强后的 system prompt 替换索引 0（本轮结束后恢复）
+            history[0] = SystemMessage(content=self._build_system(retrieved))
+
+            # 4. 流式调用 LLM
+            async with _LLM_SEM:
+                async for chunk in self.llm.astream(history):
+                    if hasattr(chunk, 'content') and chunk.content:
+                        content = chunk.content
+                        chunks.append(content)
+                        yield content
+            completed = True
+        finally:
+            # 本轮失败或客户端中断时撤销已追加的问题
+            self._end_turn(history, base_system, turn, AIMessage(content="".join(chunks)) if completed else None)
+
+
+@functools.lru_cache(maxsize=1)
 def create_rag_agent() -> RagAgent:
-    """工厂函数：创建一个 RAG Agent 实例。"""
+    """
+    工厂函数：创建 RAG Agent 实例（进程内单例）。
+
+    ChatOpenAI 内部持有 httpx 连接池，缓存后所有请求复用同一个 LLM 客户端，
+    避免每次请求重新解析配置并重建 TCP/TLS 连接。
+    """
     llm = ChatOpenAI(
         model_name=os.getenv("OPENAI_MODEL", "gpt-4o"),
         openai_api_key=os.getenv("OPENAI_API_KEY"),
         openai_api_base=os.getenv("OPENAI_BASE_URL"),
         temperature=0.0,
+        http_async_client=get_async_http_client(),
     )
 
     # 这里可以根据需要设置专门的 RAG 系统提示词
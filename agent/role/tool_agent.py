@@ -0,0 +1,126 @@
+# agent/role/tool_agent.py
+"""
+基于 OpenAI 工具调用（tool calling）的 RAG Agent。
+
+特点：
+- 由 LLM 自主决定调用 rag_search / get_document_details 等工具
+- 开启 parallel_tool_calls：同一轮返回的多个工具调用通过 asyncio.gather 并发执行，
+  耗时从各工具耗时之和降为其中最大值
+- 继承 BaseAgent 获得默认的 invoke / 流式支持
+"""
+from typing import Any, Dict, List, Sequence
+import asyncio
+import functools
+import os
+
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage
+
+from agent.registry import register_agent
+from agent.base_agent import BaseAgent
+from app.utils.http_client import get_async_http_client
+from app.utils.rag_tools import get_rag_tools
+
+load_dotenv()
+
+# 单次对话中 LLM ↔ 工具 的最大往返轮数
+_MAX_TOOL_ROUNDS = int(os.getenv("TOOL_AGENT_MAX_ROUNDS", "5"))
+
+
+class ToolAgent(BaseAgent):
+    """由 LLM 驱动工具调用的 Agent，同一轮的多个工具调用并发执行。"""
+
+    def __init__(
+        self,
+        llm: ChatOpenAI,
+        tools: Sequence[Any],
+        system_prompt: str,
+        max_rounds: int = _MAX_TOOL_ROUNDS,
+    ) -> None:
+        self.llm = llm.bind_tools(tools, parallel_tool_calls=True)
+        self.tools = {t.name: t for t in tools}
+        self.system_prompt = system_prompt
+        self.max_rounds = max_rounds
+
+    async def _run_tool_call(self, tool_call: Dict[str, Any]) -> ToolMessage:
+        """执行单个工具调用，异常转为工具输出返回给 LLM。"""
+        tool = self.tools.get(tool_call["name"])
+        if tool is None:
+            output = f"未知工具: {tool_call['name']}"
+        else:
+            try:
+                output = await tool.ainvoke(tool_call["args"])
+            except Exception as e:
+                output = f"工具执行失败: {str(e)}"
+        return ToolMessage(content=str(output), tool_call_id=tool_call["id"])
+
+    async def ainvoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步执行一次对话。
+
+        期望 inputs 结构：
+        {
+            "input": "用户问题",
+            "chat_history": [HumanMessage/AIMessage, ...]  # 可选
+        }
+        """
+        question: str = inputs.get("input", "")
+        chat_history: List[Any] = inputs.get("chat_history") or []
+
+        messages: List[Any] = [SystemMessage(content=self.system_prompt)]
+        messages.extend(chat_history)
+        messages.append(HumanMessage(content=question))
+
+        intermediate_steps: List[Dict[str, Any]] = []
+        response = None
+        for _ in range(self.max_rounds):
+            response = await self.llm.ainvoke(messages)
+            messages.append(response)
+
+            tool_calls = getattr(response, "tool_calls", None)
+            if not tool_calls:
+                break
+
+            # 同一轮的工具调用互相独立，并发执行
+            tool_messages = await asyncio.gather(
+                *(self._run_tool_call(call) for call in tool_calls)
+            )
+            messages.extend(tool_messages)
+            intermediate_steps.extend(
+                {
+                    "tool": call["name"],
+                    "input": call["args"],
+                    "output": message.content,
+                }
+                for call, message in zip(tool_calls, tool_messages)
+            )
+
+        answer = getattr(response, "content", "") if response is not None else ""
+        return {
+            "output": answer,
+            "intermediate_steps": intermediate_steps,
+        }
+
+
+@functools.lru_cache(maxsize=1)
+def create_tool_agent() -> ToolAgent:
+    """工厂函数：创建工具调用 Agent 实例（进程内单例）。"""
+    llm = ChatOpenAI(
+        model_name=os.getenv("OPENAI_MODEL", "gpt-4o"),
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        openai_api_base=os.getenv("OPENAI_BASE_URL"),
+        temperature=0.0,
+        http_async_client=get_async_http_client(),
+    )
+
+    system_prompt = (
+        "你是一个专门用于回答文档相关问题的 AI 助手，名字叫小佳。"
+        "你可以调用工具检索知识库或查看文档详情；多个互不依赖的检索可以在同一轮中同时发起。"
+    )
+
+    return ToolAgent(llm=llm, tools=get_rag_tools(), system_prompt=system_prompt)
+
+
+# 模块导入时自动注册工具调用 Agent
+register_agent("rag_tools", create_tool_agent)
@@ -1,21 +1,26 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from pydantic import BaseModel
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from typing import List, Optional, Dict, AsyncIterator
 import os
+import time
 import uuid
-import json
+import orjson
 from dotenv import load_dotenv
 from app.utils.template_loader import get_system_message_from_template
+from app.utils.chat_history import trim_history
+from app.utils.session_store import create_session_store
+from app.utils.http_client import get_async_http_client
 from agent import get_agent, list_agents
 from app.api import auth_routes
 
 load_dotenv()
 
-app = FastAPI()
+# 所有 JSON 响应默认使用 orjson 序列化
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # 注册认证路由
 app.include_router(auth_routes.router)
@@ -32,7 +37,8 @@ app.add_middleware(
 llm = ChatOpenAI(
     model_name="gpt-4o",
     openai_api_key=os.getenv("OPENAI_API_KEY"),
-    openai_api_base=os.getenv("OPENAI_BASE_URL")
+    openai_api_base=os.getenv("OPENAI_BASE_URL"),
+    http_async_client=get_async_http_client(),
 )
 
 # 加载系统提示词模板
@@ -43,11 +49,63 @@ except Exception as e:
     print(f"警告: 无法加载提示词模板: {e}")
     system_prompt = "你是一个有用的 AI 助手。"
 
-# 在内存中存储对话历史：{session_id: [messages]}
-conversation_history: Dict[str, List] = {}
+# 所有新会话共享同一个系统消息对象
+_SYSTEM_MSG = SystemMessage(content=system_prompt)
+
+# SSE 帧的固定前后缀（预先编码为 bytes）
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+
+
+def _sse_frame(payload: Dict[str, object]) -> bytes:
+    """将事件序列化为一个 SSE 帧（bytes，StreamingResponse 无需再 encode）"""
+    return _SSE_PREFIX + orjson.dumps(payload) + _SSE_SUFFIX
+
+
+# 固定内容的完成帧，只序列化一次
+_DONE_FRAME = _sse_frame({"type": "done"})
+
+# 流式输出合并阈值：缓冲达到该字符数或距上次发送超过该时间（秒）时发送一帧
+_STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "16384"))
+_STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.05"))
+
+
+async def _coalesce(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    合并细碎的流式文本块
+
+    LLM 几乎每个 token 产生一个 chunk，逐个发送时 SSE 帧头远大于正文。
+    这里把 chunk 攒到 _STREAM_FLUSH_CHARS 个字符或 _STREAM_FLUSH_INTERVAL 秒后再发送；
+    首个 chunk 通常在检索/首 token 延迟之后才到达，会立即发送，不影响首字时间。
+    """
+    buf: List[str] = []
+    buf_len = 0
+    last_flush = time.monotonic()
+    async for chunk in chunks:
+        buf.append(chunk)
+        buf_len += len(chunk)
+        now = time.monotonic()
+        if buf_len >= _STREAM_FLUSH_CHARS or now - last_flush >= _STREAM_FLUSH_INTERVAL:
+            yield "".join(buf)
+            buf = []
+            buf_len = 0
+            last_flush = now
+    if buf:
+        yield "".join(buf)
+
+
+async def _llm_text(messages: List) -> AsyncIterator[str]:
+    """流式调用 LLM，只产出非空文本内容"""
+    async for chunk in llm.astream(messages):
+        if hasattr(chunk, 'content') and chunk.content:
+            yield chunk.content
+
+
+# 对话历史存储：{session_id: [messages]}（配置 REDIS_URL 时多 worker 共享，否则进程内 LRU）
+conversation_history = create_session_store("chat")
 
 # Agent 对话历史存储：{session_id: [messages]}
-agent_conversation_history: Dict[str, List] = {}
+agent_conversation_history = create_session_store("agent")
 
 
 class ChatRequest(BaseModel):
@@ -75,8 +133,12 @@ async def health() -> Dict[str, object]:
     }
 
 
-async def stream_chat(request: ChatRequest) -> AsyncIterator[str]:
-    """流式生成聊天响应"""
+async def stream_chat(request: ChatRequest, background_tasks: BackgroundTasks) -> AsyncIterator[bytes]:
+    """
+    流式生成聊天响应
+
+    对话历史的保存交给 background_tasks，在响应全部发送后执行，不占用客户端等待时间。
+    """
     # 如果没有提供 session_id，创建一个新的
     if not request.session_id:
         session_id = str(uuid.uuid4())
@@ -84,40 +146,39 @@ async def stream_chat(request: ChatRequest) -> AsyncIterator[str]:
         session_id = request.session_id
     
     # 获取或初始化该会话的对话历史
-    if session_id not in conversation_history:
-        conversation_history[session_id] = []
+    history = await conversation_history.get(session_id)
+    if not history:
         # 如果是新会话，添加系统消息
-        conversation_history[session_id].append(SystemMessage(content=system_prompt))
+        history.append(_SYSTEM_MSG)
     
-    # 添加用户消息到历史记录
-    conversation_history[session_id].append(HumanMessage(content=request.q))
+    # 添加用户消息到历史记录，并裁剪到 token 预算内
+    history.append(HumanMessage(content=request.q))
+    trim_history(history)
     
     # 先发送 session_id
-    yield f"data: {json.dumps({'type': 'session_id', 'data': session_id})}\n\n"
+    yield _sse_frame({'type': 'session_id', 'data': session_id})
     
     # 收集完整的响应内容
-    full_content = ""
+    parts: List[str] = []
     
-    # 流式调用 LLM（包含系统消息和对话历史）
-    async for chunk in llm.astream(conversation_history[session_id]):
-        if hasattr(chunk, 'content') and chunk.content:
-            content = chunk.content
-            full_content += content
-            # 发送每个 chunk
-            yield f"data: {json.dumps({'type': 'content', 'data': content})}\n\n"
+    # 流式调用 LLM（包含系统消息和对话历史），合并细碎 chunk 后发送
+    async for content in _coalesce(_llm_text(history)):
+        parts.append(content)
+        yield _SSE_PREFIX + orjson.dumps({"type": "content", "data": content}) + _SSE_SUFFIX
     
-    # 添加完整的 AI 响应到历史记录
-    conversation_history[session_id].append(AIMessage(content=full_content))
+    # 添加完整的 AI 响应到历史记录，响应发送完成后再保存
+    history.append(AIMessage(content="".join(parts)))
+    background_tasks.add_task(conversation_history.save, session_id, history)
     
     # 发送完成标志
-    yield f"data: {json.dumps({'type': 'done'})}\n\n"
+    yield _DONE_FRAME
 
 
 @app.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
     """流式聊天接口"""
     return StreamingResponse(
-        stream_chat(request),
+        stream_chat(request, background_tasks),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -130,14 +191,21 @@ async def chat(request: ChatRequest):
 @app.delete("/chat/{session_id}")
 async def clear_history(session_id: str):
     """清除指定会话的对话历史"""
-    if session_id in conversation_history:
-        del conversation_history[session_id]
+    if await conversation_history.delete(session_id):
         return {"message": "对话历史已清除"}
     return {"message": "会话不存在"}
 
 
-async def stream_agent_chat(agent_name: str, request: AgentChatRequest) -> AsyncIterator[str]:
-    """流式生成 Agent 聊天响应"""
+async def stream_agent_chat(
+    agent_name: str,
+    request: AgentChatRequest,
+    background_tasks: BackgroundTasks,
+) -> AsyncIterator[bytes]:
+    """
+    流式生成 Agent 聊天响应
+
+    对话历史的保存交给 background_tasks，在响应全部发送后执行。
+    """
     try:
         # 请求体中指定的 agent_name 优先级更高
         actual_agent_name = request.agent_name or agent_name
@@ -147,39 +215,40 @@ async def stream_agent_chat(agent_name: str, request: AgentChatRequest) -> Async
 
         # 管理会话历史
         session_id = request.session_id or str(uuid.uuid4())
-        if session_id not in agent_conversation_history:
-            agent_conversation_history[session_id] = []
+        history = await agent_conversation_history.get(session_id)
 
         # 先发送 session_id
-        yield f"data: {json.dumps({'type': 'session_id', 'data': session_id})}\n\n"
+        yield _sse_frame({'type': 'session_id', 'data': session_id})
 
         # 收集完整的响应内容
-        full_content = ""
+        parts: List[str] = []
         intermediate_steps = []
 
         # 所有 agent 都默认支持流式（通过 BaseAgent 基类提供默认实现）
-        # 直接调用 astream 方法，无需检查
-        async for chunk in agent_instance.astream(
+        # 直接调用 astream 方法，无需检查；细碎 chunk 合并后再发送
+        async for chunk in _coalesce(agent_instance.astream(
             {
                 "input": request.q,
-                "chat_history": agent_conversation_history[session_id],
+                "chat_history": history,
             }
-        ):
-            if isinstance(chunk, str):
-                # 文本内容 chunk
-                full_content += chunk
-                yield f"data: {json.dumps({'type': 'content', 'data': chunk})}\n\n"
+        )):
+            # 文本内容 chunk
+            parts.append(chunk)
+            yield _SSE_PREFIX + orjson.dumps({"type": "content", "data": chunk}) + _SSE_SUFFIX
         
         # 中间步骤设为空（流式模式下难以获取，如果需要可以在 agent 中维护状态）
         intermediate_steps = []
 
-        # 更新历史
-        agent_conversation_history[session_id].extend(
-            [
-                HumanMessage(content=request.q),
-                AIMessage(content=full_content),
-            ]
-        )
+        # 更新历史（agent 未自行维护时），并裁剪到 token 预算内
+        if not agent_instance.updates_history:
+            history.extend(
+                [
+                    HumanMessage(content=request.q),
+                    AIMessage(content="".join(parts)),
+                ]
+            )
+        trim_history(history)
+        background_tasks.add_task(agent_conversation_history.save, session_id, history)
 
         # 发送完成标志
         done_data = {
@@ -190,18 +259,18 @@ async def stream_agent_chat(agent_name: str, request: AgentChatRequest) -> Async
                 'intermediate_steps': intermediate_steps
             }
         }
-        yield f"data: {json.dumps(done_data)}\n\n"
+        yield _sse_frame(done_data)
 
     except ValueError as e:
         # Agent 未注册
-        yield f"data: {json.dumps({'type': 'error', 'data': str(e)})}\n\n"
+        yield _sse_frame({'type': 'error', 'data': str(e)})
     except Exception as e:
         # 其他错误
-        yield f"data: {json.dumps({'type': 'error', 'data': f'Agent 执行失败: {str(e)}'})}\n\n"
+        yield _sse_frame({'type': 'error', 'data': f'Agent 执行失败: {str(e)}'})
 
 
 @app.post("/chat/run/{agent_name}/v1")
-async def chat_with_agent(agent_name: str, request: AgentChatRequest):
+async def chat_with_agent(agent_name: str, request: AgentChatRequest, background_tasks: BackgroundTasks):
     """
     使用指定的 Agent 进行对话（流式）。
 
@@ -210,7 +279,7 @@ async def chat_with_agent(agent_name: str, request: AgentChatRequest):
         request: 聊天请求，包含问题和可选的 session_id / agent_name
     """
     return StreamingResponse(
-        stream_agent_chat(agent_name, request),
+        stream_agent_chat(agent_name, request, background_tasks),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -229,7 +298,6 @@ async def list_available_agents():
 @app.delete("/chat/agent/{session_id}")
 async def clear_agent_history(session_id: str):
     """清除指定会话的 Agent 对话历史"""
-    if session_id in agent_conversation_history:
-        del agent_conversation_history[session_id]
+    if await agent_conversation_history.delete(session_id):
         return {"message": "Agent 对话历史已清除"}
     return {"message": "会话不存在"}
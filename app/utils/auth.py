@@ -6,18 +6,25 @@ from typing import Optional, Dict
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
-DB_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "localhost"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-    "database": os.getenv("POSTGRES_DB", "rag"),
-    "user": os.getenv("POSTGRES_USER", "rag"),
-    "password": os.getenv("POSTGRES_PASSWORD", "rag"),
-}
+from app.utils.db_pool import get_db_connection, register_prepared_statement
+from app.utils.ttl_cache import TTLCache
 
+# 按用户ID查询结果的进程内缓存
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
 
-def get_db_connection():
-    """获取数据库连接"""
-    return psycopg2.connect(**DB_CONFIG)
+# 高频查询使用服务端预编译语句
+register_prepared_statement("auth_get_user_by_username", """
+    SELECT id, username, email, password, is_active, is_admin, created_at
+    FROM public.users
+    WHERE username = $1
+""")
+register_prepared_statement("auth_get_user_by_id", """
+    SELECT id, username, email, password, is_active, is_admin, created_at
+    FROM public.users
+    WHERE id = $1
+""")
 
 
 def verify_password(password: str, stored_password: str) -> bool:
@@ -44,23 +51,16 @@ def get_user_by_username(username: str) -> Optional[Dict]:
     Returns:
         用户信息字典，如果不存在则返回 None
     """
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT id, username, email, password, is_active, is_admin, created_at
-                FROM public.users
-                WHERE username = %s
-            """, (username,))
+            cur.execute("EXECUTE auth_get_user_by_username(%s)", (username,))
             result = cur.fetchone()
             return dict(result) if result else None
-    finally:
-        conn.close()
 
 
 def get_user_by_id(user_id: int) -> Optional[Dict]:
     """
-    根据用户ID获取用户信息
+    根据用户ID获取用户信息（结果缓存 USER_CACHE_TTL_SECONDS 秒）
     
     Args:
         user_id: 用户ID
@@ -68,18 +68,20 @@ def get_user_by_id(user_id: int) -> Optional[Dict]:
     Returns:
         用户信息字典，如果不存在则返回 None
     """
-    conn = get_db_connection()
-    try:
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        return dict(cached)
+    
+    with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT id, username, email, password, is_active, is_admin, created_at
-                FROM public.users
-                WHERE id = %s
-            """, (user_id,))
+            cur.execute("EXECUTE auth_get_user_by_id(%s)", (user_id,))
             result = cur.fetchone()
-            return dict(result) if result else None
-    finally:
-        conn.close()
+    
+    if not result:
+        return None
+    user = dict(result)
+    _user_cache.set(user_id, user)
+    return dict(user)
 
 
 def create_user(username: str, password: str, email: Optional[str] = None, is_admin: bool = False) -> Optional[int]:
@@ -95,20 +97,18 @@ def create_user(username: str, password: str, email: Optional[str] = None, is_ad
     Returns:
         用户ID，如果创建失败则返回 None
     """
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO public.users (username, email, password, is_admin)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-            """, (username, email, password, is_admin))
-            user_id = cur.fetchone()[0]
-            conn.commit()
-            return user_id
-    except psycopg2.IntegrityError:
-        # 用户名或邮箱已存在
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO public.users (username, email, password, is_admin)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING id
+                """, (username, email, password, is_admin))
+                user_id = cur.fetchone()[0]
+                conn.commit()
+                return user_id
+        except psycopg2.IntegrityError:
+            # 用户名或邮箱已存在
+            conn.rollback()
+            return None
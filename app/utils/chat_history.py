@@ -0,0 +1,106 @@
+"""
+对话历史工具 - 有界 LRU 会话缓存 + 按 token 预算裁剪历史消息
+"""
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, List
+
+import tiktoken
+from langchain_core.messages import SystemMessage
+
+# 最多保留的会话数（超出后淘汰最久未访问的会话）
+CHAT_HISTORY_MAX_SESSIONS = int(os.getenv("CHAT_HISTORY_MAX_SESSIONS", "10000"))
+
+# 每个会话历史消息的 token 上限
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "6000"))
+
+
+class LRUHistoryCache(OrderedDict):
+    """
+    有界 LRU 字典：{session_id: [messages]}
+
+    读写都会把会话移到末尾，容量超出 maxsize 时淘汰最久未访问的会话。
+    """
+
+    def __init__(self, maxsize: int = CHAT_HISTORY_MAX_SESSIONS) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+# 消息 response_metadata 中缓存 token 数的键
+_TOKEN_COUNT_KEY = "history_token_count"
+
+
+@lru_cache(maxsize=1)
+def _get_encoder() -> tiktoken.Encoding:
+    """获取（并缓存）tiktoken 编码器"""
+    try:
+        return tiktoken.encoding_for_model(os.getenv("OPENAI_MODEL", "gpt-4o"))
+    except KeyError:
+        # 未知模型名（如自定义代理模型）时退回 gpt-4o 系列的编码
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_message_tokens(message: Any) -> int:
+    """
+    计算单条消息内容的 token 数
+
+    结果缓存在消息的 response_metadata 中（不会发送给模型，并随消息一起序列化），
+    因此每条消息在整个会话生命周期内只编码一次。
+    """
+    metadata = getattr(message, "response_metadata", None)
+    if metadata:
+        cached = metadata.get(_TOKEN_COUNT_KEY)
+        if cached is not None:
+            return cached
+
+    content = getattr(message, "content", message)
+    if not isinstance(content, str):
+        content = str(content)
+    count = len(_get_encoder().encode(content))
+
+    if metadata is not None:
+        metadata[_TOKEN_COUNT_KEY] = count
+    return count
+
+
+def trim_history(messages: List[Any], max_tokens: int = CHAT_HISTORY_MAX_TOKENS) -> List[Any]:
+    """
+    原地裁剪历史消息，使总 token 数不超过 max_tokens。
+
+    开头的 SystemMessage 始终保留；从最早的对话消息开始丢弃，
+    且至少保留最后一条消息。每条消息的 token 数只计算一次（见 count_message_tokens）。
+
+    Args:
+        messages: 消息列表（会被原地修改）
+        max_tokens: token 上限
+
+    Returns:
+        裁剪后的同一个消息列表
+    """
+    start = 0
+    while start < len(messages) and isinstance(messages[start], SystemMessage):
+        start += 1
+
+    counts = [count_message_tokens(m) for m in messages]
+    total = sum(counts)
+    end = start
+    while total > max_tokens and end < len(messages) - 1:
+        total -= counts[end]
+        end += 1
+
+    if end > start:
+        del messages[start:end]
+    return messages
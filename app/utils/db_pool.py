@@ -0,0 +1,157 @@
+"""
+数据库连接池 - auth / session_manager / db_tools 共享同一个 psycopg2 连接池
+"""
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from pgvector.psycopg2 import register_vector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 数据库配置
+DB_CONFIG = {
+    "host": os.getenv("POSTGRES_HOST", "localhost"),
+    "port": os.getenv("POSTGRES_PORT", "5432"),
+    "database": os.getenv("POSTGRES_DB", "rag"),
+    "user": os.getenv("POSTGRES_USER", "rag"),
+    "password": os.getenv("POSTGRES_PASSWORD", "rag"),
+}
+
+# 同机部署时可通过 Unix 域套接字连接（如 /var/run/postgresql），省去 TCP 握手；
+# POSTGRES_HOST 本身以 "/" 开头时 libpq 也会按套接字目录处理
+_unix_socket = os.getenv("POSTGRES_UNIX_SOCKET")
+if _unix_socket:
+    DB_CONFIG["host"] = _unix_socket
+
+if not DB_CONFIG["host"].startswith("/"):
+    # TCP 连接：开启 keepalive，避免池中长连接被 NAT/防火墙静默断开
+    DB_CONFIG.update({
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "tcp_user_timeout": 5000,
+        # 本机连接默认不启用 TLS
+        "sslmode": os.getenv(
+            "PGSSLMODE",
+            "disable" if DB_CONFIG["host"] in ("localhost", "127.0.0.1", "::1") else "prefer",
+        ),
+    })
+
+# 连接池大小
+DB_POOL_MINCONN = int(os.getenv("DB_POOL_MINCONN", "4"))
+DB_POOL_MAXCONN = int(os.getenv("DB_POOL_MAXCONN", "20"))
+# 连接全部借出时等待空闲连接的最长时间（秒）
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool 满了不会等待而是直接抛 PoolError，借出前先在这里排队
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAXCONN)
+
+# 服务端预编译语句：{语句名: SQL（参数用 $1, $2 ...）}，由各模块导入时注册
+_PREPARED_STATEMENTS: Dict[str, str] = {}
+# 每个物理连接上已 PREPARE 的语句名（连接被关闭回收后自动移除）
+_prepared_on_conn: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+# 已注册 pgvector 类型适配器的物理连接（连接被关闭回收后自动移除）
+_vector_on_conn: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """获取（首次调用时创建）全局连接池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                try:
+                    _pool = ThreadedConnectionPool(DB_POOL_MINCONN, DB_POOL_MAXCONN, **DB_CONFIG)
+                except psycopg2.OperationalError as e:
+                    raise ConnectionError(f"数据库连接失败: {str(e)}")
+    return _pool
+
+
+def register_prepared_statement(name: str, sql: str) -> None:
+    """
+    注册一条服务端预编译语句
+
+    连接首次借出时执行 PREPARE，之后调用方用 cur.execute("EXECUTE name(%s, ...)", args)
+    复用已解析、已规划的语句，省去高频小查询的 parse/plan 开销。
+    注意：PgBouncer 等事务级连接池不支持会话级 PREPARE。
+    """
+    _PREPARED_STATEMENTS[name] = sql
+
+
+def _prepare_statements(conn) -> None:
+    """在连接上 PREPARE 尚未准备的已注册语句（每个物理连接每条语句只执行一次）"""
+    prepared: Set[str] = _prepared_on_conn.setdefault(conn, set())
+    missing = [name for name in _PREPARED_STATEMENTS if name not in prepared]
+    if not missing:
+        return
+    with conn.cursor() as cur:
+        for name in missing:
+            cur.execute(f"PREPARE {name} AS {_PREPARED_STATEMENTS[name]}")
+    conn.commit()
+    prepared.update(missing)
+
+
+@contextmanager
+def get_db_connection() -> Iterator["psycopg2.extensions.connection"]:
+    """
+    从连接池借出一个连接，退出时归还
+
+    连接全部借出时最多等待 DB_POOL_TIMEOUT 秒；
+    未提交的事务（包括只读查询隐式开启的事务）会在归还前回滚；
+    已断开的连接直接关闭，不放回池中。
+    """
+    pool = get_pool()
+    if not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise ConnectionError(f"数据库连接池已满，等待 {DB_POOL_TIMEOUT} 秒后仍无空闲连接")
+    try:
+        try:
+            conn = pool.getconn()
+        except psycopg2.OperationalError as e:
+            raise ConnectionError(f"数据库连接失败: {str(e)}")
+
+        try:
+            _prepare_statements(conn)
+            yield conn
+        finally:
+            if conn.closed:
+                pool.putconn(conn, close=True)
+            else:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pool.putconn(conn, close=True)
+                else:
+                    pool.putconn(conn)
+    finally:
+        _pool_slots.release()
+
+
+def ensure_vector_registered(conn) -> None:
+    """
+    在连接上注册 pgvector 的 vector 类型适配器（每个物理连接只注册一次）
+
+    注册后 vector 列以 numpy.ndarray 返回（二进制解析，无需 ::text 再逐个 float()），
+    查询参数也可以直接传入 numpy.ndarray。
+    按连接注册（register_vector(conn)），兼容 pgvector 0.2.x 起的所有版本。
+    """
+    if conn in _vector_on_conn:
+        return
+    register_vector(conn)
+    _vector_on_conn.add(conn)
+
+
+def close_pool() -> None:
+    """关闭连接池中的所有连接（进程退出或测试时使用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
@@ -1,29 +1,140 @@
 """
 数据库工具函数
 """
+import logging
 import os
-import psycopg2
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, Tuple
+
+import numpy as np
+import orjson
 from dotenv import load_dotenv
 
+from app.utils.db_pool import get_db_connection, ensure_vector_registered, register_prepared_statement
+from app.utils.rerank import RERANK_BACKEND, RERANK_CANDIDATES, rerank
+
 load_dotenv()
 
-# 数据库配置
-DB_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "localhost"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-    "database": os.getenv("POSTGRES_DB", "rag"),
-    "user": os.getenv("POSTGRES_USER", "rag"),
-    "password": os.getenv("POSTGRES_PASSWORD", "rag"),
-}
+logger = logging.getLogger(__name__)
+
+# 是否输出检索调试日志（会额外执行 COUNT 查询，默认关闭）。
+# 应用没有配置 root logger，开启时单独挂一个输出到 stderr 的 handler，否则 DEBUG 记录会被丢弃
+if os.getenv("DB_TOOLS_DEBUG", "false").lower() == "true":
+    logger.setLevel(logging.DEBUG)
+    if not logger.handlers:
+        _debug_handler = logging.StreamHandler()
+        _debug_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+        logger.addHandler(_debug_handler)
+        logger.propagate = False
+
+# HNSW 查询时的候选列表下限（实际取 max(HNSW_EF_SEARCH_MIN, top_k * 4)）
+HNSW_EF_SEARCH_MIN = int(os.getenv("HNSW_EF_SEARCH_MIN", "40"))
+
+# 导出 chunk embedding 时服务端游标每批拉取的行数
+CHUNK_EXPORT_ITERSIZE = int(os.getenv("CHUNK_EXPORT_ITERSIZE", "500"))
+
+# 无法使用 ANN 索引、退化为顺序扫描时允许的并行 worker 数
+DB_PARALLEL_WORKERS_PER_GATHER = int(os.getenv("DB_PARALLEL_WORKERS_PER_GATHER", "4"))
+
+register_prepared_statement("db_get_document_info", """
+    SELECT id, source_url, title, content, content_hash, created_at
+    FROM public.document
+    WHERE id = $1
+""")
 
 
-def get_db_connection():
-    """获取数据库连接"""
-    try:
-        return psycopg2.connect(**DB_CONFIG)
-    except psycopg2.OperationalError as e:
-        raise ConnectionError(f"数据库连接失败: {str(e)}")
+def _normalize(embedding) -> np.ndarray:
+    """归一化为单位向量（embedding_half 列存储的是单位向量，内积即余弦相似度）"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _to_vector_literal(embedding) -> str:
+    """
+    将 embedding 转为 pgvector 文本字面量 "[x1,x2,...]"
+
+    orjson 在 C 中一次完成浮点数格式化，输出恰好是 pgvector 的输入格式，
+    避免逐元素 str(float)；同时接受 list 和 numpy.ndarray。
+    """
+    return orjson.dumps(embedding, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def _set_search_params(cur, top_k: int) -> None:
+    """在当前事务内设置向量检索参数（一次往返完成）"""
+    cur.execute(
+        "SET LOCAL hnsw.ef_search = %s; SET LOCAL max_parallel_workers_per_gather = %s",
+        (max(HNSW_EF_SEARCH_MIN, top_k * 4), DB_PARALLEL_WORKERS_PER_GATHER)
+    )
+
+
+def _fetch_documents(cur, document_ids) -> Dict[int, Tuple[Optional[str], Optional[str]]]:
+    """按文档 ID 批量查询标题和来源 URL：{document_id: (title, source_url)}"""
+    if not document_ids:
+        return {}
+    cur.execute(
+        "SELECT id, title, source_url FROM public.document WHERE id = ANY(%s)",
+        (list(document_ids),)
+    )
+    return {doc_id: (title, url) for doc_id, title, url in cur.fetchall()}
+
+
+def _chunk_result(row, document: Tuple[Optional[str], Optional[str]]) -> Dict[str, Any]:
+    """将 ANN 查询的一行 (id, document_id, chunk_index, content, similarity) 与文档信息拼成结果字典"""
+    chunk_id, doc_id, chunk_index, content, similarity = row
+    return {
+        "id": chunk_id,
+        "document_id": doc_id,
+        "chunk_index": chunk_index,
+        "content": content,
+        "similarity": float(similarity) if similarity is not None else 0.0,
+        "document_title": document[0],
+        "document_url": document[1]
+    }
+
+
+def _fetch_chunk_embeddings(cur, chunk_ids) -> Dict[int, np.ndarray]:
+    """按 chunk ID 批量查询原始 embedding：{chunk_id: float32 numpy.ndarray}"""
+    # embedding 列为 halfvec，转为 vector 后由 pgvector 适配器解析为 float32 numpy.ndarray
+    cur.execute(
+        "SELECT id, embedding::vector FROM public.document_chunk WHERE id = ANY(%s)",
+        (list(chunk_ids),)
+    )
+    return dict(cur.fetchall())
+
+
+def _rerank_rows(
+    cur,
+    rows: List[tuple],
+    query_embedding,
+    top_k: int,
+    similarity_threshold: float,
+    embeddings: Optional[Dict[int, np.ndarray]] = None
+) -> List[tuple]:
+    """
+    用原始 embedding 精确计算余弦相似度，对 ANN 候选行重新打分，返回前 top_k 行（similarity 替换为精确值）
+
+    rows 的格式为 (id, document_id, chunk_index, content, similarity)。
+    embeddings 为已查出的 {chunk_id: embedding}，不提供时按 rows 查询。
+    """
+    if embeddings is None:
+        embeddings = _fetch_chunk_embeddings(cur, [row[0] for row in rows])
+    rows = [row for row in rows if embeddings.get(row[0]) is not None]
+    if not rows:
+        return []
+    scores, indices = rerank(
+        query_embedding,
+        np.vstack([embeddings[row[0]] for row in rows]),
+        top_k,
+    )
+    return [
+        (*rows[i][:4], float(score))
+        for score, i in zip(scores, indices)
+        if score >= similarity_threshold
+    ]
 
 
 def get_document_chunk_embeddings(document_id: int) -> List[Dict[str, Any]]:
@@ -40,18 +151,15 @@ def get_document_chunk_embeddings(document_id: int) -> List[Dict[str, Any]]:
         - content: chunk 内容
         - embedding: embedding 向量（列表格式）
     """
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            # 查询 document_chunk 的 embedding
-            # 注意：PostgreSQL 的 vector 类型需要转换为数组
+    with get_db_connection() as conn:
+        ensure_vector_registered(conn)
+        # 服务端（命名）游标：按 CHUNK_EXPORT_ITERSIZE 行分批拉取，不会一次把所有向量缓冲到客户端
+        with conn.cursor(name="chunk_embedding_stream") as cur:
+            cur.itersize = CHUNK_EXPORT_ITERSIZE
+            # 查询 document_chunk 的 embedding（halfvec 转为 vector，由 pgvector 适配器直接解析为 numpy.ndarray）
             cur.execute(
                 """
-                SELECT 
-                    id,
-                    chunk_index,
-                    content,
-                    embedding::text as embedding_text
+                SELECT id, chunk_index, content, embedding::vector
                 FROM public.document_chunk
                 WHERE document_id = %s
                 ORDER BY chunk_index ASC
@@ -60,51 +168,122 @@ def get_document_chunk_embeddings(document_id: int) -> List[Dict[str, Any]]:
             )
             
             results = []
-            for row in cur.fetchall():
-                chunk_id, chunk_index, content, embedding_text = row
-                
-                # 将 PostgreSQL vector 文本格式转换为列表
-                # vector 格式: [0.1,0.2,0.3,...]
-                embedding = None
-                if embedding_text:
-                    # 移除方括号并分割
-                    embedding_str = embedding_text.strip('[]')
-                    embedding = [float(x) for x in embedding_str.split(',')]
-                
+            for chunk_id, chunk_index, content, embedding in cur:
                 results.append({
                     "id": chunk_id,
                     "chunk_index": chunk_index,
                     "content": content,
-                    "embedding": embedding,
-                    "embedding_dimension": len(embedding) if embedding else 0
+                    "embedding": embedding.tolist() if embedding is not None else None,
+                    "embedding_dimension": len(embedding) if embedding is not None else 0
                 })
             
             return results
-    finally:
-        conn.close()
 
 
-def get_document_info(document_id: int) -> Optional[Dict[str, Any]]:
+@dataclass
+class ChunkEmbeddings:
     """
-    获取文档基本信息
+    某个文档全部 chunk 的 embedding（列式存储）
+
+    embeddings 是形状为 (N, dim) 的连续 float32 矩阵，第 i 行对应 ids[i] / chunk_indexes[i] / contents[i]，
+    下游可以直接做矩阵运算（例如 embeddings @ q），无需逐个处理 Python float 列表。
+    """
+    ids: np.ndarray
+    chunk_indexes: np.ndarray
+    contents: List[str]
+    embeddings: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def get_document_chunk_embeddings_array(document_id: int) -> ChunkEmbeddings:
+    """
+    查询指定文档所有有 embedding 的 chunk，以 ChunkEmbeddings（numpy 矩阵）返回
+    
+    与 get_document_chunk_embeddings 相比不为每个向量分量创建 Python float 对象，
+    内存占用约为其 1/10，适合需要继续做向量计算的调用方。
     
     Args:
         document_id: 文档 ID
         
     Returns:
-        文档信息字典，如果不存在返回 None
+        ChunkEmbeddings，按 chunk_index 升序
     """
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
+    with get_db_connection() as conn:
+        ensure_vector_registered(conn)
+        with conn.cursor(name="chunk_embedding_stream") as cur:
+            cur.itersize = CHUNK_EXPORT_ITERSIZE
             cur.execute(
                 """
-                SELECT id, source_url, title, content, content_hash, created_at
-                FROM public.document
-                WHERE id = %s
+                SELECT id, chunk_index, content, embedding::vector
+                FROM public.document_chunk
+                WHERE document_id = %s AND embedding IS NOT NULL
+                ORDER BY chunk_index ASC
                 """,
                 (document_id,)
             )
+            # 边从游标按批拉取边写入预分配的矩阵（容量不足时倍增），不在内存中保留全部行
+            ids = np.empty(CHUNK_EXPORT_ITERSIZE, dtype=np.int64)
+            chunk_indexes = np.empty(CHUNK_EXPORT_ITERSIZE, dtype=np.int64)
+            embeddings: Optional[np.ndarray] = None
+            contents: List[str] = []
+            n = 0
+            while True:
+                block = cur.fetchmany(CHUNK_EXPORT_ITERSIZE)
+                if not block:
+                    break
+                if embeddings is None:
+                    embeddings = np.empty((len(ids), len(block[0][3])), dtype=np.float32)
+                if n + len(block) > len(ids):
+                    capacity = max(len(ids) * 2, n + len(block))
+                    ids = _grow(ids, capacity)
+                    chunk_indexes = _grow(chunk_indexes, capacity)
+                    embeddings = _grow(embeddings, capacity)
+                for chunk_id, chunk_index, content, embedding in block:
+                    ids[n] = chunk_id
+                    # chunk_index 列可为空，缺失时记为 -1
+                    chunk_indexes[n] = -1 if chunk_index is None else chunk_index
+                    contents.append(content)
+                    embeddings[n] = embedding
+                    n += 1
+    
+    if n == 0:
+        return ChunkEmbeddings(
+            ids=np.empty(0, dtype=np.int64),
+            chunk_indexes=np.empty(0, dtype=np.int64),
+            contents=[],
+            embeddings=np.empty((0, 0), dtype=np.float32),
+        )
+    
+    return ChunkEmbeddings(
+        ids=ids[:n],
+        chunk_indexes=chunk_indexes[:n],
+        contents=contents,
+        embeddings=embeddings[:n],
+    )
+
+
+def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    """把数组首维扩容到 capacity，保留已有数据"""
+    grown = np.empty((capacity, *array.shape[1:]), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def get_document_info(document_id: int) -> Optional[Dict[str, Any]]:
+    """
+    获取文档基本信息
+    
+    Args:
+        document_id: 文档 ID
+        
+    Returns:
+        文档信息字典，如果不存在返回 None
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("EXECUTE db_get_document_info(%s)", (document_id,))
             row = cur.fetchone()
             
             if not row:
@@ -118,8 +297,6 @@ def get_document_info(document_id: int) -> Optional[Dict[str, Any]]:
                 "content_hash": row[4],
                 "created_at": row[5].isoformat() if row[5] else None
             }
-    finally:
-        conn.close()
 
 
 def search_similar_chunks(
@@ -145,160 +322,161 @@ def search_similar_chunks(
         - document_title: 文档标题
         - document_url: 文档 URL
     """
-    if not query_embedding:
+    if query_embedding is None or len(query_embedding) == 0:
         return []
     
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            # 先检查数据库中是否有数据
-            cur.execute("SELECT COUNT(*) FROM public.document_chunk WHERE embedding IS NOT NULL")
-            total_chunks = cur.fetchone()[0]
-            print(f"[调试] 数据库中总共有 {total_chunks} 个有 embedding 的 chunks")
+    # 归一化后转换为 PostgreSQL vector 格式字符串（查询时转为 halfvec，与 embedding_half 列比较）
+    embedding_str = _to_vector_literal(_normalize(query_embedding))
+    # <#> 返回负内积：similarity >= t 等价于 (embedding_half <#> q) <= -t
+    max_distance = -similarity_threshold
+    
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                debug = logger.isEnabledFor(logging.DEBUG)
+                if debug:
+                    cur.execute("SELECT COUNT(*) FROM public.document_chunk WHERE embedding_half IS NOT NULL")
+                    logger.debug(
+                        "数据库中总共有 %d 个有 embedding 的 chunks，query embedding 维度: %d",
+                        cur.fetchone()[0], len(query_embedding)
+                    )
+
+                # 开启重排时 ANN 阶段多召回一些候选，再用原始 embedding 精确计算余弦相似度
+                limit = max(top_k, RERANK_CANDIDATES) if RERANK_BACKEND else top_k
+
+                # 仅对当前事务生效：按召回数量调整 HNSW 的 ef_search，平衡召回率与延迟；
+                # 规划器放弃索引改走顺序扫描时（如表很小或过滤条件很严）允许并行扫描
+                _set_search_params(cur, limit)
+            
+                # ANN 查询只取 chunk 本身：ORDER BY 与阈值过滤使用同一个距离表达式，规划器可以直接走 HNSW 索引
+                cur.execute(
+                    """
+                    SELECT 
+                        dc.id,
+                        dc.document_id,
+                        dc.chunk_index,
+                        dc.content,
+                        -(dc.embedding_half <#> %(q)s::halfvec) AS similarity
+                    FROM public.document_chunk dc
+                    WHERE dc.embedding_half IS NOT NULL
+                      AND dc.embedding_half <#> %(q)s::halfvec <= %(max_distance)s
+                    ORDER BY dc.embedding_half <#> %(q)s::halfvec
+                    LIMIT %(top_k)s
+                    """,
+                    {"q": embedding_str, "max_distance": max_distance, "top_k": limit}
+                )
+                rows = cur.fetchall()
+                if RERANK_BACKEND and rows:
+                    ensure_vector_registered(conn)
+                    rows = _rerank_rows(cur, rows, query_embedding, top_k, similarity_threshold)
             
-            if total_chunks == 0:
-                print("[警告] 数据库中没有包含 embedding 的 chunks，请先运行数据导入脚本")
-                return []
+                # 命中的 chunk 通常集中在少数几个文档，标题/URL 按去重后的文档 ID 一次查出
+                documents = _fetch_documents(cur, {row[1] for row in rows})
+                results = [
+                    _chunk_result(row, documents[row[1]])
+                    for row in rows
+                    if row[1] in documents
+                ]
             
-            # 将 embedding 列表转换为 PostgreSQL vector 格式字符串
-            embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
-            print(f"[调试] Query embedding 维度: {len(query_embedding)}")
-            print(f"[调试] Embedding 字符串长度: {len(embedding_str)} (前100字符: {embedding_str[:100]}...)")
+                if debug:
+                    if results:
+                        logger.debug("检索到 %d 个文档（阈值: %s）", len(results), similarity_threshold)
+                        for i, r in enumerate(results[:3], 1):  # 只记录前3个
+                            logger.debug("  [%d] Doc ID: %s, 相似度: %.4f", i, r['document_id'], r['similarity'])
+                    else:
+                        logger.debug("未找到满足阈值 %s 的文档", similarity_threshold)
             
-            # 先查询 top_k 个最相似的结果（不应用阈值过滤）
-            try:
-                # 使用子查询先计算相似度，避免 ORDER BY 可能的问题
+                return results
+        except Exception:
+            logger.exception("向量搜索失败")
+            return []
+
+
+def search_similar_chunks_batch(
+    query_embeddings: List[List[float]],
+    top_k: int = 5,
+    similarity_threshold: float = 0.0
+) -> List[List[Dict[str, Any]]]:
+    """
+    一次查询完成多个 query embedding 的向量检索（CROSS JOIN LATERAL）
+    
+    适用于查询改写、HyDE 等会产生多个子查询的场景：N 次检索只需一次往返，
+    每个子查询仍按 search_similar_chunks 相同的方式走 HNSW 索引。
+    
+    Args:
+        query_embeddings: 多个查询的 embedding 向量
+        top_k: 每个查询返回最相似的 k 个结果
+        similarity_threshold: 相似度阈值（0-1），低于此值的结果将被过滤
+        
+    Returns:
+        与 query_embeddings 一一对应的结果列表，每个元素的格式同 search_similar_chunks
+    """
+    if not query_embeddings:
+        return []
+    
+    embedding_strs = [_to_vector_literal(_normalize(e)) for e in query_embeddings]
+    max_distance = -similarity_threshold
+    results: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+    
+    # 开启重排时与 search_similar_chunks 一致：多召回候选，再逐个查询精确重排
+    limit = max(top_k, RERANK_CANDIDATES) if RERANK_BACKEND else top_k
+    
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                _set_search_params(cur, limit)
                 cur.execute(
                     """
-                    WITH similarity_scores AS (
-                        SELECT 
+                    SELECT
+                        q.qid,
+                        r.id,
+                        r.document_id,
+                        r.chunk_index,
+                        r.content,
+                        r.similarity
+                    FROM unnest(%(qs)s::halfvec[]) WITH ORDINALITY AS q(vec, qid)
+                    CROSS JOIN LATERAL (
+                        SELECT
                             dc.id,
                             dc.document_id,
                             dc.chunk_index,
                             dc.content,
-                            1 - (dc.embedding <=> %s::vector) as similarity,
-                            d.title as document_title,
-                            d.source_url as document_url
+                            -(dc.embedding_half <#> q.vec) AS similarity
                         FROM public.document_chunk dc
-                        JOIN public.document d ON dc.document_id = d.id
-                        WHERE dc.embedding IS NOT NULL
-                    )
-                    SELECT 
-                        id,
-                        document_id,
-                        chunk_index,
-                        content,
-                        similarity,
-                        document_title,
-                        document_url
-                    FROM similarity_scores
-                    WHERE similarity IS NOT NULL
-                    ORDER BY similarity DESC
-                    LIMIT %s
+                        WHERE dc.embedding_half IS NOT NULL
+                          AND dc.embedding_half <#> q.vec <= %(max_distance)s
+                        ORDER BY dc.embedding_half <#> q.vec
+                        LIMIT %(top_k)s
+                    ) r
+                    ORDER BY q.qid, r.similarity DESC
                     """,
-                    (embedding_str, top_k * 2)  # 多查询一些，然后过滤
+                    {"qs": embedding_strs, "max_distance": max_distance, "top_k": limit}
                 )
-                rows = cur.fetchall()
-                print(f"[调试] SQL 查询返回 {len(rows)} 行结果")
-            except Exception as e:
-                print(f"[错误] SQL 查询执行失败: {e}")
-                import traceback
-                traceback.print_exc()
-                return []
-            
-            all_candidates = []
-            results = []
-            for row in rows:
-                chunk_id, doc_id, chunk_index, content, similarity, doc_title, doc_url = row
-                similarity_value = float(similarity) if similarity else 0.0
+                # WITH ORDINALITY 从 1 开始编号
+                rows_by_query: List[List[tuple]] = [[] for _ in query_embeddings]
+                for qid, *row in cur.fetchall():
+                    rows_by_query[qid - 1].append(tuple(row))
                 
-                # 记录所有候选结果用于调试
-                all_candidates.append({
-                    "doc_id": doc_id,
-                    "similarity": similarity_value,
-                    "title": doc_title
-                })
+                if RERANK_BACKEND:
+                    ensure_vector_registered(conn)
+                    # 各子查询的候选有大量重叠，原始 embedding 按去重后的 chunk ID 一次查出
+                    embeddings = _fetch_chunk_embeddings(
+                        cur, {row[0] for rows in rows_by_query for row in rows}
+                    )
+                    rows_by_query = [
+                        _rerank_rows(cur, rows, query_embedding, top_k, similarity_threshold, embeddings)
+                        if rows else rows
+                        for rows, query_embedding in zip(rows_by_query, query_embeddings)
+                    ]
                 
-                # 应用相似度阈值过滤
-                if similarity_value >= similarity_threshold:
-                    results.append({
-                        "id": chunk_id,
-                        "document_id": doc_id,
-                        "chunk_index": chunk_index,
-                        "content": content,
-                        "similarity": similarity_value,
-                        "document_title": doc_title,
-                        "document_url": doc_url
-                    })
-            
-            # 打印所有候选结果的相似度（用于调试）
-            if all_candidates:
-                print(f"[调试] 查询到的前 {len(all_candidates)} 个候选文档相似度:")
-                for i, cand in enumerate(all_candidates[:5], 1):
-                    print(f"  [{i}] Doc ID: {cand['doc_id']}, 相似度: {cand['similarity']:.4f}, 标题: {cand['title']}")
-            
-            # 打印调试信息
-            if results:
-                print(f"[调试] 检索到 {len(results)} 个文档（阈值: {similarity_threshold}）")
-                for i, r in enumerate(results[:3], 1):  # 只打印前3个
-                    print(f"  [{i}] Doc ID: {r['document_id']}, 相似度: {r['similarity']:.4f}")
-            else:
-                print(f"[调试] 未找到满足阈值 {similarity_threshold} 的文档")
-                # 查询最相似的一个用于调试
-                if total_chunks > 0:
-                    try:
-                        cur.execute(
-                            """
-                            WITH similarity_scores AS (
-                                SELECT 
-                                    dc.id,
-                                    dc.document_id,
-                                    dc.chunk_index,
-                                    dc.content,
-                                    1 - (dc.embedding <=> %s::vector) as similarity,
-                                    d.title as document_title,
-                                    d.source_url as document_url
-                                FROM public.document_chunk dc
-                                JOIN public.document d ON dc.document_id = d.id
-                                WHERE dc.embedding IS NOT NULL
-                            )
-                            SELECT 
-                                id,
-                                document_id,
-                                chunk_index,
-                                content,
-                                similarity,
-                                document_title,
-                                document_url
-                            FROM similarity_scores
-                            WHERE similarity IS NOT NULL
-                            ORDER BY similarity DESC
-                            LIMIT 1
-                            """,
-                            (embedding_str,)
-                        )
-                        row = cur.fetchone()
-                        if row:
-                            chunk_id, doc_id, chunk_index, content, similarity, doc_title, doc_url = row
-                            max_similarity = float(similarity) if similarity else 0.0
-                            print(f"[调试] 最相似的文档相似度: {max_similarity:.4f} (低于阈值 {similarity_threshold})")
-                            print(f"[调试] 最相似文档标题: {doc_title}")
-                            # 安全处理内容预览，避免编码错误
-                            try:
-                                content_preview = content[:100] if content else ""
-                                print(f"[调试] 最相似文档内容预览: {content_preview}...")
-                            except Exception:
-                                print(f"[调试] 最相似文档内容预览: [内容包含特殊字符，无法显示]")
-                        else:
-                            print("[调试] 查询最相似文档时返回空结果")
-                    except Exception as e:
-                        print(f"[调试] 查询最相似文档时出错: {e}")
-            
+                documents = _fetch_documents(cur, {row[1] for rows in rows_by_query for row in rows})
+                for results_for_query, rows in zip(results, rows_by_query):
+                    results_for_query.extend(
+                        _chunk_result(row, documents[row[1]])
+                        for row in rows
+                        if row[1] in documents
+                    )
             return results
-    except Exception as e:
-        print(f"[错误] 向量搜索失败: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
-    finally:
-        conn.close()
+        except Exception:
+            logger.exception("批量向量搜索失败")
+            return [[] for _ in query_embeddings]
@@ -0,0 +1,45 @@
+"""
+共享 HTTP 客户端 - 所有 OpenAI 调用复用同一个 httpx 连接池
+"""
+import os
+from functools import lru_cache
+
+import httpx
+
+# 连接池大小
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    获取（并缓存）共享的异步 httpx 客户端
+
+    启用 HTTP/2，多个会话的流式请求可以复用同一条连接，避免每个请求重新握手 TLS。
+    连接池绑定在首次使用它的事件循环上，只能在同一个循环中使用
+    （同步调用方通过 BaseAgent.invoke 的常驻后台循环执行）。
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """
+    获取（并缓存）共享的同步 httpx 客户端
+
+    供同步调用（文档入库时的 embedding 请求等）使用，同样启用 HTTP/2 并复用连接池。
+    """
+    return httpx.Client(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    )
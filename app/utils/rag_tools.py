@@ -3,13 +3,19 @@ RAG Tools - 将数据库工具函数转换为 LangChain Tools
 """
 from langchain.tools import tool
 from langchain_openai import OpenAIEmbeddings
-from typing import List
+from typing import Any, Dict, List
 import os
 from dotenv import load_dotenv
-from app.utils.db_tools import search_similar_chunks, get_document_info
+from app.utils.db_tools import search_similar_chunks, search_similar_chunks_batch, get_document_info
 
 load_dotenv()
 
+# 向量维度，必须与 document_chunk.embedding 列（halfvec(1024)，见迁移 005、010）一致
+EMBEDDING_DIMENSION = 1024
+
+# embed_documents 单次 HTTP 请求携带的最大文本数（OpenAI 上限为 2048）
+EMBEDDING_CHUNK_SIZE = int(os.getenv("EMBEDDING_CHUNK_SIZE", "2048"))
+
 # 初始化 embedding 模型（用于将查询文本转换为向量）
 _embeddings_model = None
 
@@ -21,11 +27,92 @@ def get_embeddings_model():
             model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"),
             openai_api_key=os.getenv("OPENAI_API_KEY"),
             openai_api_base=os.getenv("OPENAI_BASE_URL"),
-            dimensions=1024  # 匹配数据库中的向量维度
+            dimensions=EMBEDDING_DIMENSION,  # 匹配数据库中的向量维度
+            chunk_size=EMBEDDING_CHUNK_SIZE,
         )
     return _embeddings_model
 
 
+def embed_query(query: str) -> List[float]:
+    """将查询文本转换为 embedding 向量（与 rag_search 使用同一个模型）"""
+    return get_embeddings_model().embed_query(query)
+
+
+def get_embeddings_batch(texts: List[str]) -> List[List[float]]:
+    """
+    批量将文本转换为 embedding 向量
+    
+    embed_documents 会把最多 EMBEDDING_CHUNK_SIZE 条文本合并到一次 HTTP 请求中，
+    有多个查询时应先收集起来再调用本函数，而不是逐条调用 embed_query。
+    """
+    if not texts:
+        return []
+    return get_embeddings_model().embed_documents(texts)
+
+
+def search_documents(
+    query_embedding: List[float],
+    top_k: int = 5,
+    similarity_threshold: float = 0.3
+) -> str:
+    """
+    使用已计算好的 query embedding 检索相关文档，并格式化为 rag_search 的输出格式。
+    
+    Args:
+        query_embedding: 查询文本的 embedding 向量
+        top_k: 返回最相似的文档数量
+        similarity_threshold: 相似度阈值（0-1）
+    
+    Returns:
+        格式化后的检索结果；没有找到相关文档时返回 "未找到相关文档"
+    """
+    # 搜索相似的 chunks
+    similar_chunks = search_similar_chunks(
+        query_embedding=query_embedding,
+        top_k=top_k,
+        similarity_threshold=similarity_threshold
+    )
+    return _format_chunks(similar_chunks)
+
+
+def search_documents_batch(
+    query_embeddings: List[List[float]],
+    top_k: int = 5,
+    similarity_threshold: float = 0.3
+) -> List[str]:
+    """
+    批量检索多个 query embedding（一次数据库往返），用于多查询/查询改写场景。
+    
+    Returns:
+        与 query_embeddings 一一对应的格式化检索结果，格式同 search_documents
+    """
+    batch = search_similar_chunks_batch(
+        query_embeddings=query_embeddings,
+        top_k=top_k,
+        similarity_threshold=similarity_threshold
+    )
+    return [_format_chunks(chunks) for chunks in batch]
+
+
+def _format_chunks(similar_chunks: List[Dict[str, Any]]) -> str:
+    """将检索到的 chunks 格式化为 rag_search 的输出格式"""
+    if not similar_chunks:
+        return "未找到相关文档"
+    
+    # 格式化返回结果
+    results = []
+    for i, chunk in enumerate(similar_chunks, 1):
+        result = f"[文档 {i}]\n"
+        result += f"标题: {chunk.get('document_title', '未知')}\n"
+        result += f"内容: {chunk.get('content', '')}\n"
+        result += f"相似度: {chunk.get('similarity', 0.0):.4f}\n"
+        if chunk.get('document_url'):
+            result += f"来源: {chunk.get('document_url')}\n"
+        results.append(result)
+    
+    return "\n\n".join(results)
+
+
 @tool
 def rag_search(
     query: str,
@@ -52,31 +139,47 @@ def rag_search(
     """
     try:
         # 将查询文本转换为 embedding
-        embeddings_model = get_embeddings_model()
-        query_embedding = embeddings_model.embed_query(query)
+        query_embedding = embed_query(query)
         
-        # 搜索相似的 chunks
-        similar_chunks = search_similar_chunks(
+        # 搜索并格式化结果
+        return search_documents(
             query_embedding=query_embedding,
             top_k=top_k,
             similarity_threshold=similarity_threshold
         )
-        
-        if not similar_chunks:
-            return "未找到相关文档"
-        
-        # 格式化返回结果
-        results = []
-        for i, chunk in enumerate(similar_chunks, 1):
-            result = f"[文档 {i}]\n"
-            result += f"标题: {chunk.get('document_title', '未知')}\n"
-            result += f"内容: {chunk.get('content', '')}\n"
-            result += f"相似度: {chunk.get('similarity', 0.0):.4f}\n"
-            if chunk.get('document_url'):
-                result += f"来源: {chunk.get('document_url')}\n"
-            results.append(result)
-        
-        return "\n\n".join(results)
+    
+    except Exception as e:
+        return f"检索过程中发生错误: {str(e)}"
+
+
+@tool
+def rag_multi_search(
+    queries: List[str],
+    top_k: int = 5,
+    similarity_threshold: float = 0.3
+) -> str:
+    """
+    同时检索多个查询（例如从不同角度改写的同一个问题），比多次调用 rag_search 更快。
+    
+    Args:
+        queries: 查询文本列表
+        top_k: 每个查询返回最相似的文档数量，默认为 5
+        similarity_threshold: 相似度阈值（0-1），低于此值的结果将被过滤，默认为 0.3
+    
+    Returns:
+        按查询分组的检索结果，每组格式与 rag_search 相同。
+    """
+    try:
+        # 一次请求完成所有查询的 embedding，再一次数据库往返完成所有检索
+        query_embeddings = get_embeddings_batch(queries)
+        batch = search_documents_batch(
+            query_embeddings=query_embeddings,
+            top_k=top_k,
+            similarity_threshold=similarity_threshold
+        )
+        return "\n\n".join(
+            f"=== 查询: {query} ===\n{result}" for query, result in zip(queries, batch)
+        )
     
     except Exception as e:
         return f"检索过程中发生错误: {str(e)}"
@@ -126,4 +229,4 @@ def get_rag_tools() -> List:
     Returns:
         LangChain Tool 对象列表
     """
-    return [rag_search, get_document_details]
+    return [rag_search, rag_multi_search, get_document_details]
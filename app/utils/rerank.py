@@ -0,0 +1,71 @@
+"""
+向量重排 - 对 ANN 粗召回的候选 chunk 用原始 embedding 精确计算余弦相似度
+
+RERANK_BACKEND:
+- 未设置（默认）：不重排，直接使用 HNSW（halfvec）的结果
+- "numpy"：用一次矩阵乘法计算内积
+- "faiss"：用 faiss.IndexFlatIP 计算（需要 pip install faiss-cpu 或 faiss-gpu）
+"""
+import os
+from typing import Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RERANK_BACKEND = os.getenv("RERANK_BACKEND", "").lower()
+if RERANK_BACKEND not in ("", "numpy", "faiss"):
+    raise ValueError(f"不支持的 RERANK_BACKEND: {RERANK_BACKEND!r}（可选值: numpy, faiss，留空表示不重排）")
+
+# 开启重排时 ANN 阶段召回的候选数量
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "200"))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def rerank(
+    query_embedding: np.ndarray,
+    candidate_embeddings: np.ndarray,
+    top_k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按余弦相似度对候选向量精确排序
+
+    Args:
+        query_embedding: 查询向量，形状 (dim,)
+        candidate_embeddings: 候选向量矩阵，形状 (N, dim)
+        top_k: 返回前 k 个
+
+    Returns:
+        (scores, indices)：相似度降序排列的前 k 个分数，以及它们在 candidate_embeddings 中的行号
+    """
+    query = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+    candidates = np.ascontiguousarray(candidate_embeddings, dtype=np.float32)
+    k = min(top_k, len(candidates))
+    if k == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+    if RERANK_BACKEND == "faiss":
+        try:
+            import faiss
+        except ImportError:
+            raise ImportError("RERANK_BACKEND=faiss 需要安装: pip install faiss-cpu（或 faiss-gpu）")
+
+        query = query.copy()
+        candidates = candidates.copy()
+        faiss.normalize_L2(query)
+        faiss.normalize_L2(candidates)
+        index = faiss.IndexFlatIP(candidates.shape[1])
+        index.add(candidates)
+        scores, indices = index.search(query, k)
+        return scores[0], indices[0]
+
+    scores = _normalize_rows(candidates) @ _normalize_rows(query)[0]
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return scores[top], top
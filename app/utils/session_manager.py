@@ -5,25 +5,35 @@ import os
 import secrets
 from datetime import datetime, timedelta
 from typing import Optional, Dict
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
-# 数据库配置（复用现有的配置）
-DB_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "localhost"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-    "database": os.getenv("POSTGRES_DB", "rag"),
-    "user": os.getenv("POSTGRES_USER", "rag"),
-    "password": os.getenv("POSTGRES_PASSWORD", "rag"),
-}
+from app.utils.db_pool import get_db_connection, register_prepared_statement
+from app.utils.ttl_cache import TTLCache
 
 # Session 过期时间（默认 30 分钟）
 SESSION_EXPIRE_MINUTES = int(os.getenv("SESSION_EXPIRE_MINUTES", "30"))
 
+# 已校验 session 的进程内缓存：命中时不访问数据库，last_accessed_at 也只在缓存过期后才刷新
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "30"))
+_session_cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL_SECONDS)
 
-def get_db_connection():
-    """获取数据库连接"""
-    return psycopg2.connect(**DB_CONFIG)
+# 每个请求都会执行的会话查询使用服务端预编译语句
+register_prepared_statement("session_create", """
+    INSERT INTO public.sessions (session_id, user_id, expires_at, ip_address, user_agent)
+    VALUES ($1, $2, $3, $4, $5)
+""")
+# 校验会话并刷新最后访问时间：一条 UPDATE ... RETURNING，一次往返
+register_prepared_statement("session_get", """
+    UPDATE public.sessions s
+    SET last_accessed_at = now()
+    FROM public.users u
+    WHERE s.session_id = $1 AND s.expires_at > now() AND u.id = s.user_id
+    RETURNING s.*, u.username, u.is_admin, u.is_active
+""")
+register_prepared_statement("session_delete", """
+    DELETE FROM public.sessions WHERE session_id = $1
+""")
 
 
 def create_session(user_id: int, ip_address: Optional[str] = None, user_agent: Optional[str] = None) -> str:
@@ -41,22 +51,21 @@ def create_session(user_id: int, ip_address: Optional[str] = None, user_agent: O
     session_id = secrets.token_urlsafe(32)  # 生成安全的随机字符串
     expires_at = datetime.now() + timedelta(minutes=SESSION_EXPIRE_MINUTES)
     
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO public.sessions (session_id, user_id, expires_at, ip_address, user_agent)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (session_id, user_id, expires_at, ip_address, user_agent))
+            cur.execute(
+                "EXECUTE session_create(%s, %s, %s, %s, %s)",
+                (session_id, user_id, expires_at, ip_address, user_agent)
+            )
             conn.commit()
             return session_id
-    finally:
-        conn.close()
 
 
 def get_session(session_id: str) -> Optional[Dict]:
     """
-    获取 session 信息
+    获取 session 信息（同时刷新最后访问时间）
+    
+    结果在进程内缓存 SESSION_CACHE_TTL_SECONDS 秒，缓存命中时不访问数据库。
     
     Args:
         session_id: 会话ID
@@ -64,29 +73,24 @@ def get_session(session_id: str) -> Optional[Dict]:
     Returns:
         session 信息字典，如果不存在或已过期则返回 None
     """
-    conn = get_db_connection()
-    try:
+    cached = _session_cache.get(session_id)
+    if cached is not None:
+        if cached["expires_at"] > datetime.now():
+            return dict(cached)
+        _session_cache.pop(session_id)
+        return None
+    
+    with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT s.*, u.username, u.is_admin, u.is_active
-                FROM public.sessions s
-                JOIN public.users u ON s.user_id = u.id
-                WHERE s.session_id = %s AND s.expires_at > now()
-            """, (session_id,))
+            cur.execute("EXECUTE session_get(%s)", (session_id,))
             result = cur.fetchone()
-            
-            if result:
-                # 更新最后访问时间
-                cur.execute("""
-                    UPDATE public.sessions
-                    SET last_accessed_at = now()
-                    WHERE session_id = %s
-                """, (session_id,))
-                conn.commit()
-                return dict(result)
-            return None
-    finally:
-        conn.close()
+            conn.commit()
+    
+    if not result:
+        return None
+    session = dict(result)
+    _session_cache.set(session_id, session)
+    return dict(session)
 
 
 def delete_session(session_id: str) -> bool:
@@ -99,14 +103,12 @@ def delete_session(session_id: str) -> bool:
     Returns:
         是否成功删除
     """
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM public.sessions WHERE session_id = %s", (session_id,))
+            cur.execute("EXECUTE session_delete(%s)", (session_id,))
             conn.commit()
+            _session_cache.pop(session_id)
             return cur.rowcount > 0
-    finally:
-        conn.close()
 
 
 def delete_user_sessions(user_id: int) -> int:
@@ -119,25 +121,20 @@ def delete_user_sessions(user_id: int) -> int:
     Returns:
         删除的 session 数量
     """
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM public.sessions WHERE user_id = %s", (user_id,))
             conn.commit()
+            _session_cache.pop_where(lambda session: session["user_id"] == user_id)
             return cur.rowcount
-    finally:
-        conn.close()
 
 
 def cleanup_expired_sessions():
     """
     清理过期的 session（可以定期运行，比如每天）
     """
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM public.sessions WHERE expires_at < now()")
             conn.commit()
             return cur.rowcount
-    finally:
-        conn.close()
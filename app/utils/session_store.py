@@ -0,0 +1,121 @@
+"""
+对话历史存储 - 支持进程内 LRU 与 Redis 两种后端
+
+- 未配置 REDIS_URL 时使用进程内 LRUHistoryCache（仅适用于单 worker）
+- 配置 REDIS_URL 后使用 Redis：每个会话一个 list key（RPUSH/LRANGE），带 TTL，
+  消息用 msgpack 序列化，多个 uvicorn worker 之间共享会话历史
+
+注意：这里存储的是聊天对话历史，与 session_manager.py 中的登录会话无关。
+"""
+import os
+from typing import Any, List, Sequence
+
+from dotenv import load_dotenv
+from langchain_core.messages import message_to_dict, messages_from_dict
+
+from app.utils.chat_history import LRUHistoryCache
+
+load_dotenv()
+
+# Redis 连接地址，未配置时使用进程内存储
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Redis 中会话历史的过期时间（秒）
+CHAT_HISTORY_TTL_SECONDS = int(os.getenv("CHAT_HISTORY_TTL_SECONDS", "86400"))
+
+
+class MemorySessionStore:
+    """进程内会话历史存储（有界 LRU）。"""
+
+    def __init__(self, namespace: str) -> None:
+        self.namespace = namespace
+        self._cache = LRUHistoryCache()
+
+    async def get(self, session_id: str) -> List[Any]:
+        """获取会话消息列表，不存在时返回空列表"""
+        if session_id in self._cache:
+            return self._cache[session_id]
+        return []
+
+    async def append(self, session_id: str, messages: Sequence[Any]) -> None:
+        """向会话末尾追加消息"""
+        if session_id not in self._cache:
+            self._cache[session_id] = []
+        self._cache[session_id].extend(messages)
+
+    async def save(self, session_id: str, messages: List[Any]) -> None:
+        """用 messages 覆盖整个会话历史"""
+        self._cache[session_id] = messages
+
+    async def delete(self, session_id: str) -> bool:
+        """删除会话历史，返回会话是否存在"""
+        if session_id in self._cache:
+            del self._cache[session_id]
+            return True
+        return False
+
+
+class RedisSessionStore:
+    """基于 redis.asyncio 的会话历史存储，可在多个 worker 之间共享。"""
+
+    def __init__(self, namespace: str, url: str, ttl: int = CHAT_HISTORY_TTL_SECONDS) -> None:
+        try:
+            import msgpack
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise ImportError("使用 Redis 存储对话历史需要安装: pip install redis msgpack")
+
+        self.namespace = namespace
+        self.ttl = ttl
+        self._msgpack = msgpack
+        self._redis = aioredis.from_url(url)
+
+    def _key(self, session_id: str) -> str:
+        return f"chat_history:{self.namespace}:{session_id}"
+
+    def _pack(self, messages: Sequence[Any]) -> List[bytes]:
+        return [self._msgpack.packb(message_to_dict(m)) for m in messages]
+
+    async def get(self, session_id: str) -> List[Any]:
+        """获取会话消息列表，不存在时返回空列表"""
+        raw = await self._redis.lrange(self._key(session_id), 0, -1)
+        return messages_from_dict([self._msgpack.unpackb(item) for item in raw])
+
+    async def append(self, session_id: str, messages: Sequence[Any]) -> None:
+        """向会话末尾追加消息并刷新过期时间"""
+        if not messages:
+            return
+        key = self._key(session_id)
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.rpush(key, *self._pack(messages))
+        pipe.expire(key, self.ttl)
+        await pipe.execute()
+
+    async def save(self, session_id: str, messages: List[Any]) -> None:
+        """用 messages 覆盖整个会话历史（历史已按 token 预算裁剪，长度有界）"""
+        key = self._key(session_id)
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.delete(key)
+        if messages:
+            pipe.rpush(key, *self._pack(messages))
+            pipe.expire(key, self.ttl)
+        await pipe.execute()
+
+    async def delete(self, session_id: str) -> bool:
+        """删除会话历史，返回会话是否存在"""
+        return await self._redis.delete(self._key(session_id)) > 0
+
+
+def create_session_store(namespace: str):
+    """
+    创建会话历史存储
+
+    Args:
+        namespace: 命名空间（如 "chat"、"agent"），用于区分不同接口的历史
+
+    Returns:
+        配置了 REDIS_URL 时返回 RedisSessionStore，否则返回 MemorySessionStore
+    """
+    if REDIS_URL:
+        return RedisSessionStore(namespace, REDIS_URL)
+    return MemorySessionStore(namespace)
@@ -1,7 +1,9 @@
 """
 模板加载器 - 用于加载和渲染 Jinja2 模板
 """
-from jinja2 import Environment, FileSystemLoader
+import functools
+import os
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
 from pathlib import Path
 from typing import Dict, Any, Optional
 
@@ -10,20 +12,34 @@ from typing import Dict, Any, Optional
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 TEMPLATES_DIR = PROJECT_ROOT / "prompts"
 
+# 编译后模板字节码的缓存目录，进程重启后无需重新编译模板。
+# 未配置时使用 Jinja2 默认的按用户隔离目录（权限 0700 并校验属主），不使用共享的临时目录
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR")
 
+
+@functools.lru_cache(maxsize=1)
 def get_template_env() -> Environment:
-    """获取 Jinja2 环境"""
+    """获取 Jinja2 环境（进程内单例；模板修改后需重启进程生效）"""
     if not TEMPLATES_DIR.exists():
         TEMPLATES_DIR.mkdir(parents=True, exist_ok=True)
+    if JINJA_CACHE_DIR:
+        Path(JINJA_CACHE_DIR).mkdir(parents=True, exist_ok=True, mode=0o700)
+        bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+    else:
+        bytecode_cache = FileSystemBytecodeCache()
     
     return Environment(
         loader=FileSystemLoader(str(TEMPLATES_DIR)),
         trim_blocks=True,
         lstrip_blocks=True,
+        auto_reload=False,
+        cache_size=400,
+        bytecode_cache=bytecode_cache,
     )
 
 
-def load_template(template_name: str) -> str:
+@functools.lru_cache(maxsize=128)
+def load_template(template_name: str) -> Template:
     """
     加载模板文件内容
     
@@ -31,7 +47,7 @@ def load_template(template_name: str) -> str:
         template_name: 模板文件名（如 "rag_instructions.j2"）
     
     Returns:
-        模板内容字符串
+        编译后的模板对象（按模板名缓存）
     """
     env = get_template_env()
     template = env.get_template(template_name)
@@ -53,12 +69,18 @@ def render_template(template_name: str, **kwargs) -> str:
     return template.render(**kwargs)
 
 
+@functools.lru_cache(maxsize=128)
+def _render_template_cached(template_name: str, **kwargs) -> str:
+    """按模板名和模板变量缓存渲染结果（模板变量必须可哈希）"""
+    return render_template(template_name, **kwargs)
+
+
 def get_system_message_from_template(
     template_name: str = "rag_instructions.j2",
     **kwargs
 ) -> str:
     """
-    从模板获取系统消息
+    从模板获取系统消息（模板变量可哈希时缓存渲染结果）
     
     Args:
         template_name: 模板文件名
@@ -67,4 +89,10 @@ def get_system_message_from_template(
     Returns:
         系统消息字符串
     """
-    return render_template(template_name, **kwargs)
+    # 先单独检查模板变量能否作为缓存键，渲染过程中抛出的 TypeError 照常向上传播
+    try:
+        hash(tuple(sorted(kwargs.items())))
+    except TypeError:
+        # 模板变量中含有 list/dict 等不可哈希的值，无法作为缓存键，直接渲染
+        return render_template(template_name, **kwargs)
+    return _render_template_cached(template_name, **kwargs)
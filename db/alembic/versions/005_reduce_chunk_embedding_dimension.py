@@ -0,0 +1,70 @@
+"""reduce document_chunk.embedding dimension from 1536 to 1024
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+# 与 rag_tools / ingestion 中 OpenAIEmbeddings(dimensions=1024) 保持一致
+EMBEDDING_DIMENSION = 1024
+
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+
+# 并行构建 HNSW 索引（pgvector >= 0.6.0）：worker 数与构建可用内存
+INDEX_BUILD_WORKERS = int(os.getenv("INDEX_BUILD_WORKERS", "7"))
+INDEX_BUILD_MEMORY = os.getenv("INDEX_BUILD_MEMORY", "2GB")
+
+
+def _create_hnsw_index() -> None:
+    op.execute(f"SET LOCAL max_parallel_maintenance_workers = {INDEX_BUILD_WORKERS}")
+    op.execute(f"SET LOCAL maintenance_work_mem = '{INDEX_BUILD_MEMORY}'")
+    op.execute(f"""
+        CREATE INDEX idx_document_chunk_embedding
+        ON public.document_chunk
+        USING hnsw (embedding vector_cosine_ops)
+        WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});
+    """)
+
+
+def upgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS public.idx_document_chunk_embedding")
+
+    # text-embedding-3 系列支持 Matryoshka 截断：超长的旧向量直接取前 1024 维
+    # （余弦距离与向量长度无关，无需重新归一化）
+    op.execute(f"""
+        ALTER TABLE public.document_chunk
+        ALTER COLUMN embedding TYPE vector({EMBEDDING_DIMENSION})
+        USING (
+            CASE
+                WHEN vector_dims(embedding) > {EMBEDDING_DIMENSION}
+                    THEN subvector(embedding, 1, {EMBEDDING_DIMENSION})
+                ELSE embedding
+            END
+        )::vector({EMBEDDING_DIMENSION});
+    """)
+
+    _create_hnsw_index()
+
+
+def downgrade() -> None:
+    # 截断后的向量无法还原为 1536 维，降级后需要重新导入 embedding
+    op.execute("DROP INDEX IF EXISTS public.idx_document_chunk_embedding")
+    op.execute("""
+        ALTER TABLE public.document_chunk
+        ALTER COLUMN embedding TYPE vector(1536)
+        USING NULL;
+    """)
+    _create_hnsw_index()
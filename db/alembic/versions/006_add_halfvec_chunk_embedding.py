@@ -0,0 +1,58 @@
+"""add halfvec copy of document_chunk.embedding for ANN search
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+
+# 并行构建 HNSW 索引（pgvector >= 0.6.0）：worker 数与构建可用内存
+INDEX_BUILD_WORKERS = int(os.getenv("INDEX_BUILD_WORKERS", "7"))
+INDEX_BUILD_MEMORY = os.getenv("INDEX_BUILD_MEMORY", "2GB")
+
+
+def upgrade() -> None:
+    # 半精度（FP16）生成列：由 embedding 自动计算，写入方无需改动（需要 pgvector >= 0.7.0）
+    op.execute("""
+        ALTER TABLE public.document_chunk
+        ADD COLUMN embedding_half halfvec(1024)
+        GENERATED ALWAYS AS (embedding::halfvec(1024)) STORED;
+    """)
+
+    # 检索改为走半精度索引，全精度索引不再需要
+    op.execute("DROP INDEX IF EXISTS public.idx_document_chunk_embedding")
+    op.execute(f"SET LOCAL max_parallel_maintenance_workers = {INDEX_BUILD_WORKERS}")
+    op.execute(f"SET LOCAL maintenance_work_mem = '{INDEX_BUILD_MEMORY}'")
+    op.execute(f"""
+        CREATE INDEX idx_document_chunk_embedding_half
+        ON public.document_chunk
+        USING hnsw (embedding_half halfvec_cosine_ops)
+        WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS public.idx_document_chunk_embedding_half")
+    op.execute("ALTER TABLE public.document_chunk DROP COLUMN IF EXISTS embedding_half")
+    op.execute(f"SET LOCAL max_parallel_maintenance_workers = {INDEX_BUILD_WORKERS}")
+    op.execute(f"SET LOCAL maintenance_work_mem = '{INDEX_BUILD_MEMORY}'")
+    op.execute(f"""
+        CREATE INDEX idx_document_chunk_embedding
+        ON public.document_chunk
+        USING hnsw (embedding vector_cosine_ops)
+        WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});
+    """)
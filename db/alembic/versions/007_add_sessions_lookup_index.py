@@ -0,0 +1,34 @@
+"""add covering index for session lookup
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 会话校验（session_id = ? AND expires_at > now()）可直接在索引中完成过期判断和关联用户
+    # 注意：不包含 last_accessed_at —— 每次校验都会更新该列，放进索引会使这些更新无法走 HOT
+    op.execute("""
+        CREATE UNIQUE INDEX idx_sessions_lookup
+        ON public.sessions (session_id)
+        INCLUDE (user_id, expires_at);
+    """)
+
+    # 被覆盖索引取代
+    op.drop_index('idx_sessions_session_id', table_name='sessions', schema='public')
+
+
+def downgrade() -> None:
+    op.create_index('idx_sessions_session_id', 'sessions', ['session_id'], schema='public', unique=True)
+    op.execute("DROP INDEX IF EXISTS public.idx_sessions_lookup")
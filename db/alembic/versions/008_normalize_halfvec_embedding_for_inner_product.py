@@ -0,0 +1,52 @@
+"""store normalized halfvec embeddings and index them for inner product
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+
+# 并行构建 HNSW 索引（pgvector >= 0.6.0）：worker 数与构建可用内存
+INDEX_BUILD_WORKERS = int(os.getenv("INDEX_BUILD_WORKERS", "7"))
+INDEX_BUILD_MEMORY = os.getenv("INDEX_BUILD_MEMORY", "2GB")
+
+
+def _rebuild_embedding_half(expression: str, opclass: str) -> None:
+    # 生成列的表达式不能直接修改，删除后重建（其上的索引随列一起删除）
+    op.execute("ALTER TABLE public.document_chunk DROP COLUMN IF EXISTS embedding_half")
+    op.execute(f"""
+        ALTER TABLE public.document_chunk
+        ADD COLUMN embedding_half halfvec(1024)
+        GENERATED ALWAYS AS ({expression}) STORED;
+    """)
+    op.execute(f"SET LOCAL max_parallel_maintenance_workers = {INDEX_BUILD_WORKERS}")
+    op.execute(f"SET LOCAL maintenance_work_mem = '{INDEX_BUILD_MEMORY}'")
+    op.execute(f"""
+        CREATE INDEX idx_document_chunk_embedding_half
+        ON public.document_chunk
+        USING hnsw (embedding_half {opclass})
+        WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});
+    """)
+
+
+def upgrade() -> None:
+    # 存储单位向量：余弦相似度等于内积，检索改用更省计算的 <#>（halfvec_ip_ops）
+    _rebuild_embedding_half("l2_normalize(embedding)::halfvec(1024)", "halfvec_ip_ops")
+
+
+def downgrade() -> None:
+    _rebuild_embedding_half("embedding::halfvec(1024)", "halfvec_cosine_ops")
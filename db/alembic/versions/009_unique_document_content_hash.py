@@ -0,0 +1,38 @@
+"""make document.content_hash unique
+
+Revision ID: 009
+Revises: 008
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 唯一索引：导入脚本用 INSERT ... ON CONFLICT (content_hash) 一次完成查重和插入
+    op.drop_index('idx_document_content_hash', table_name='document', schema='public')
+    op.create_index(
+        'idx_document_content_hash',
+        'document',
+        ['content_hash'],
+        schema='public',
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_document_content_hash', table_name='document', schema='public')
+    op.create_index(
+        'idx_document_content_hash',
+        'document',
+        ['content_hash'],
+        schema='public'
+    )
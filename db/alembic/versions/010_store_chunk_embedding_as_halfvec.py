@@ -0,0 +1,57 @@
+"""store document_chunk.embedding as halfvec (FP16)
+
+Revision ID: 010
+Revises: 009
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+
+# 并行构建 HNSW 索引（pgvector >= 0.6.0）：worker 数与构建可用内存
+INDEX_BUILD_WORKERS = int(os.getenv("INDEX_BUILD_WORKERS", "7"))
+INDEX_BUILD_MEMORY = os.getenv("INDEX_BUILD_MEMORY", "2GB")
+
+
+def _change_embedding_type(column_type: str) -> None:
+    # embedding_half 由 embedding 生成，修改 embedding 类型前需先删除（其上的索引随列一起删除）
+    op.execute("ALTER TABLE public.document_chunk DROP COLUMN IF EXISTS embedding_half")
+    op.execute(f"""
+        ALTER TABLE public.document_chunk
+        ALTER COLUMN embedding TYPE {column_type} USING embedding::{column_type};
+    """)
+    op.execute("""
+        ALTER TABLE public.document_chunk
+        ADD COLUMN embedding_half halfvec(1024)
+        GENERATED ALWAYS AS (l2_normalize(embedding)::halfvec(1024)) STORED;
+    """)
+    op.execute(f"SET LOCAL max_parallel_maintenance_workers = {INDEX_BUILD_WORKERS}")
+    op.execute(f"SET LOCAL maintenance_work_mem = '{INDEX_BUILD_MEMORY}'")
+    op.execute(f"""
+        CREATE INDEX idx_document_chunk_embedding_half
+        ON public.document_chunk
+        USING hnsw (embedding_half halfvec_ip_ops)
+        WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});
+    """)
+
+
+def upgrade() -> None:
+    # 原始 embedding 也改为半精度存储，每个 chunk 从 4KB 降到 2KB（需要 pgvector >= 0.7.0）
+    _change_embedding_type("halfvec(1024)")
+
+
+def downgrade() -> None:
+    # 精度无法恢复，只还原列类型
+    _change_embedding_type("vector(1024)")
@@ -3,6 +3,7 @@
 """
 __all__ = [
     "split_text",
+    "fast_split",
     "create_splitter",
     "default_splitter",
     "fetch_page",
@@ -25,9 +26,9 @@ def __getattr__(name):
         if name in ["fetch_page", "fetch_text_only", "fetch_url_as_text"]:
             from .fetch import fetch_page, fetch_text_only, fetch_url_as_text
             return {"fetch_page": fetch_page, "fetch_text_only": fetch_text_only, "fetch_url_as_text": fetch_url_as_text}[name]
-        elif name in ["split_text", "create_splitter", "default_splitter"]:
-            from .splitter import split_text, create_splitter, default_splitter
-            return {"split_text": split_text, "create_splitter": create_splitter, "default_splitter": default_splitter}[name]
+        elif name in ["split_text", "fast_split", "create_splitter", "default_splitter"]:
+            from .splitter import split_text, fast_split, create_splitter, default_splitter
+            return {"split_text": split_text, "fast_split": fast_split, "create_splitter": create_splitter, "default_splitter": default_splitter}[name]
         elif name in ["parse_file", "parse_file_simple", "get_supported_extensions", "is_supported"]:
             from .parser import parse_file, parse_file_simple, get_supported_extensions, is_supported
             return {"parse_file": parse_file, "parse_file_simple": parse_file_simple, "get_supported_extensions": get_supported_extensions, "is_supported": is_supported}[name]
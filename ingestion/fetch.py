@@ -2,7 +2,8 @@
 网页内容获取模块 - 支持从 URL 获取数据
 """
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve as sv
 from typing import Tuple, Optional, Dict, Any
 from urllib.parse import urljoin, urlparse
 import chardet
@@ -10,12 +11,39 @@ import argparse
 import sys
 import re
 
+# 在原始字节上探测 <meta charset> / <meta http-equiv="Content-Type"> 声明的编码（无需先解析 HTML）
+_META_CHARSET_RE = re.compile(rb'charset=["\']?([\w\-]+)', re.I)
+
+# 按 host 缓存探测到的编码：同一站点的页面编码基本不变，首次探测成功后直接复用
+_HOST_ENCODING: Dict[str, str] = {}
+
+# 常见的正文容器选择器，按优先级排列
+_CONTENT_SELECTORS = (
+    ".v_news_content",  # 特定的内容类
+    "article",
+    "main",
+    ".content",
+    "#content",
+    ".post-content",
+    ".entry-content",
+)
+_CONTENT_PATTERNS = tuple(sv.compile(selector) for selector in _CONTENT_SELECTORS)
+_CONTENT_SELECTOR = sv.compile(", ".join(_CONTENT_SELECTORS))
+
+# 解析时直接丢弃 <head> 里的 meta/link/script/style 等，只保留 <title> 和完整的 <body>。
+# SoupStrainer 只在顶层过滤：<body> 必须整体保留，否则直接写在 <body> 下的文本会被丢掉；
+# 正文中的 script/style 等由 _extract_content 再去除
+PAGE_STRAINER = SoupStrainer(
+    re.compile(r'^(?!(?:html|head|meta|link|base|script|style|noscript|svg|template)$)')
+)
+
 
 def fetch_page(
     url: str, 
     timeout: int = 10, 
     encoding: Optional[str] = None,
     headers: Optional[Dict[str, str]] = None,
+    cache_encoding: bool = True,
     **kwargs
 ) -> Tuple[str, str]:
     """
@@ -26,6 +54,7 @@ def fetch_page(
         timeout: 请求超时时间（秒），默认 10
         encoding: 响应编码，如果为 None 则自动检测
         headers: 自定义请求头字典
+        cache_encoding: 是否按 host 缓存自动检测到的编码，默认 True
         **kwargs: 其他 requests.get() 支持的参数（如 cookies, auth 等）
     
     Returns:
@@ -49,20 +78,22 @@ def fetch_page(
         resp = requests.get(url, **request_kwargs)
         resp.raise_for_status()
         
+        # 响应头 Content-Type 已声明 charset 时直接使用，无需探测
+        if encoding is None and 'charset' in resp.headers.get('content-type', '').lower():
+            encoding = _normalize_encoding(resp.encoding)
+        
+        host = urlparse(url).netloc
+        encoding_sniffed = False
+        if encoding is None and cache_encoding:
+            encoding = _HOST_ENCODING.get(host)
+        
         # 自动检测编码（如果未指定）
         if encoding is None:
+            encoding_sniffed = True
             # 优先从 HTML meta 标签获取编码
-            soup_temp = BeautifulSoup(resp.content[:5000], "html.parser")
-            meta_charset = soup_temp.find('meta', {'charset': True})
-            if meta_charset:
-                encoding = meta_charset.get('charset', '').lower()
-            if not encoding:
-                meta_content = soup_temp.find('meta', attrs={'http-equiv': re.compile('content-type', re.I)})
-                if meta_content and meta_content.get('content'):
-                    import re
-                    charset_match = re.search(r'charset=([^;]+)', meta_content['content'], re.I)
-                    if charset_match:
-                        encoding = charset_match.group(1).strip().lower()
+            charset_match = _META_CHARSET_RE.search(resp.content[:4096])
+            if charset_match:
+                encoding = charset_match.group(1).decode('ascii').lower()
             
             # 如果 HTML 中没有找到，使用 chardet 检测
             if not encoding:
@@ -71,19 +102,7 @@ def fetch_page(
                 if detected_encoding and detected.get('confidence', 0) > 0.7:
                     encoding = detected_encoding.lower()
             
-            # 标准化编码名称
-            if encoding:
-                encoding = encoding.lower().strip()
-                if encoding in ['utf-8-sig', 'utf8-sig']:
-                    encoding = 'utf-8-sig'
-                elif encoding in ['utf-8', 'utf8']:
-                    encoding = 'utf-8'
-                elif encoding in ['gb2312', 'gbk', 'gb18030']:
-                    encoding = 'gb18030'
-                elif encoding == 'ascii':
-                    encoding = 'utf-8'
-            else:
-                encoding = 'utf-8'
+            encoding = _normalize_encoding(encoding) or 'utf-8'
         
         # 解码内容
         try:
@@ -100,7 +119,11 @@ def fetch_page(
             else:
                 html_content = resp.content.decode('utf-8', errors='replace')
         
-        soup = BeautifulSoup(html_content, "html.parser")
+        if encoding_sniffed and cache_encoding and host:
+            _HOST_ENCODING[host] = encoding
+        
+        # 整个页面只解析一次，lxml 比 html.parser 快数倍；非正文标签在解析阶段即被跳过
+        soup = BeautifulSoup(html_content, "lxml", parse_only=PAGE_STRAINER)
         
         # 提取标题
         title_tag = soup.find('title')
@@ -117,6 +140,22 @@ def fetch_page(
         raise Exception(f"处理网页内容时出错: {str(e)}")
 
 
+def _normalize_encoding(encoding: Optional[str]) -> Optional[str]:
+    """标准化编码名称"""
+    if not encoding:
+        return None
+    encoding = encoding.lower().strip()
+    if encoding in ['utf-8-sig', 'utf8-sig']:
+        return 'utf-8-sig'
+    if encoding in ['utf-8', 'utf8']:
+        return 'utf-8'
+    if encoding in ['gb2312', 'gbk', 'gb18030']:
+        return 'gb18030'
+    if encoding == 'ascii':
+        return 'utf-8'
+    return encoding
+
+
 def _extract_content(soup: BeautifulSoup, url: str = None) -> str:
     """
     从 HTML 中提取正文内容
@@ -128,24 +167,17 @@ def _extract_content(soup: BeautifulSoup, url: str = None) -> str:
     Returns:
         提取的文本内容
     """
-    # 尝试多种常见的内容选择器
-    content_selectors = [
-        ".v_news_content",  # 特定的内容类
-        "article",
-        "main",
-        ".content",
-        "#content",
-        ".post-content",
-        ".entry-content",
-    ]
-    
-    for selector in content_selectors:
-        content_div = soup.select_one(selector)
-        if content_div:
-            # 移除脚本和样式标签
-            for script in content_div(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
-            return content_div.get_text("\n", strip=True)
+    # 一次遍历取出所有候选，再按选择器优先级挑选（与逐个 select_one 的结果一致）
+    candidates = _CONTENT_SELECTOR.select(soup)
+    content_div = next(
+        (el for pattern in _CONTENT_PATTERNS for el in candidates if pattern.match(el)),
+        None
+    )
+    if content_div:
+        # 移除脚本和样式标签
+        for script in content_div(["script", "style", "nav", "footer", "header"]):
+            script.decompose()
+        return content_div.get_text("\n", strip=True)
     
     # 如果没有找到特定的内容区域，尝试提取 body 内容
     body = soup.find('body')
@@ -154,8 +186,8 @@ def _extract_content(soup: BeautifulSoup, url: str = None) -> str:
             script.decompose()
         return body.get_text("\n", strip=True)
     
-    # 最后尝试提取整个文档
-    for script in soup(["script", "style", "nav", "footer", "header", "aside"]):
+    # 最后尝试提取整个文档（解析时已去掉 <head> 元数据，这里再去掉 <title>）
+    for script in soup(["title", "script", "style", "nav", "footer", "header", "aside"]):
         script.decompose()
     return soup.get_text("\n", strip=True)
 
@@ -223,17 +255,18 @@ def main():
     parser.add_argument("-o", "--output", type=str, default=None, help="输出文件，默认 stdout")
     parser.add_argument("--title-only", action="store_true", help="仅输出标题")
     parser.add_argument("--text-only", action="store_true", help="仅输出文本")
+    parser.add_argument("--no-cache-encoding", action="store_true", help="不按 host 缓存检测到的编码")
     
     args = parser.parse_args()
     
     try:
         if args.title_only:
-            title, _ = fetch_page(args.url, timeout=args.timeout, encoding=args.encoding)
+            title, _ = fetch_page(args.url, timeout=args.timeout, encoding=args.encoding, cache_encoding=not args.no_cache_encoding)
             content = title
         elif args.text_only:
-            content = fetch_text_only(args.url, timeout=args.timeout, encoding=args.encoding)
+            content = fetch_text_only(args.url, timeout=args.timeout, encoding=args.encoding, cache_encoding=not args.no_cache_encoding)
         else:
-            title, text = fetch_page(args.url, timeout=args.timeout, encoding=args.encoding)
+            title, text = fetch_page(args.url, timeout=args.timeout, encoding=args.encoding, cache_encoding=not args.no_cache_encoding)
             content = f"{title}\n\n{text}"
         
         if args.output:
@@ -1,11 +1,17 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-import time
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
 import hashlib
 import os
 import sys
+import numpy as np
 import psycopg2
+from psycopg2.extras import execute_values
+from pgvector.psycopg2 import register_vector
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
 
@@ -14,6 +20,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+from ingestion.fetch import PAGE_STRAINER
 from ingestion.splitter import split_text
 
 load_dotenv()
@@ -30,6 +37,16 @@ HEADERS = {
     "Accept": "text/html,application/xhtml+xml"
 }
 
+# 并发抓取的线程数
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+
+# 复用 TCP/TLS 连接的 HTTP 会话（连接池大小与抓取线程数匹配）
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
 # 数据库配置
 DB_CONFIG = {
     "host": os.getenv("POSTGRES_HOST", "localhost"),
@@ -44,6 +61,13 @@ EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
 
+# 每次 embedding 请求携带的 chunk 数（跨文档合并后按此大小分批请求）
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
+# content_hash 仅用于去重：sha256（默认，与已入库数据一致）或 xxh3_128（更快，需要 pip install xxhash）
+CONTENT_HASH_ALGORITHM = os.getenv("CONTENT_HASH_ALGORITHM", "sha256").lower()
+HASH_SLICE_SIZE = 64 * 1024
+
 
 def get_db_connection():
     """获取数据库连接"""
@@ -70,8 +94,18 @@ def get_db_connection():
 
 
 def calculate_hash(text: str) -> str:
-    """计算文本的 SHA256 哈希值"""
-    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    """计算文本的哈希值（算法由 CONTENT_HASH_ALGORITHM 决定），按片段增量编码，不复制整份 bytes"""
+    if CONTENT_HASH_ALGORITHM == "xxh3_128":
+        try:
+            import xxhash
+        except ImportError:
+            raise ImportError("CONTENT_HASH_ALGORITHM=xxh3_128 需要安装: pip install xxhash")
+        hasher = xxhash.xxh3_128()
+    else:
+        hasher = hashlib.sha256()
+    for start in range(0, len(text), HASH_SLICE_SIZE):
+        hasher.update(text[start:start + HASH_SLICE_SIZE].encode('utf-8'))
+    return hasher.hexdigest()
 
 
 def get_embeddings_model():
@@ -80,6 +114,7 @@ def get_embeddings_model():
         "model": EMBEDDING_MODEL,
         "openai_api_key": OPENAI_API_KEY,
         "dimensions": 1024,  # 指定生成 1024 维度的向量，匹配数据库 schema
+        "chunk_size": EMBED_BATCH_SIZE,
     }
     if OPENAI_BASE_URL:
         kwargs["openai_api_base"] = OPENAI_BASE_URL
@@ -88,7 +123,7 @@ def get_embeddings_model():
 
 def fetch(url):
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
+        resp = SESSION.get(url, timeout=10)
         resp.encoding = resp.apparent_encoding
         return resp.text
     except Exception as e:
@@ -96,11 +131,19 @@ def fetch(url):
         return ""
 
 
-def parse_content(html, base_url):
-    soup = BeautifulSoup(html, "lxml")
+def extract_page(html: str, url: str) -> dict:
+    """
+    解析一次页面，从同一棵树中取出标题、正文、图片，并计算 content_hash
+
+    Returns:
+        {"url", "title", "text", "images", "content_hash"}（正文为空时 content_hash 为 None）
+    """
+    # 解析时即跳过 <head> 里的元数据，只保留 <title> 和完整的 <body>（与 ingestion.fetch 相同的过滤规则）
+    soup = BeautifulSoup(html, "lxml", parse_only=PAGE_STRAINER)
 
     # 标题
-    title = soup.find("title").get_text(strip=True) if soup.find("title") else ""
+    title_tag = soup.find("title")
+    title = title_tag.get_text(strip=True) if title_tag else ""
 
     # 尽量找正文区域
     main = soup.find("div", class_="news_content") or soup.find("div", id="content") or soup
@@ -113,87 +156,131 @@ def parse_content(html, base_url):
     for img in main.find_all("img"):
         src = img.get("src")
         if src:
-            imgs.append(urljoin(base_url, src))
+            imgs.append(urljoin(url, src))
 
     return {
+        "url": url,
         "title": title,
         "text": text,
-        "images": imgs
+        "images": imgs,
+        "content_hash": calculate_hash(text) if text.strip() else None,
     }
 
 
-def save_document_to_db(url: str, title: str, content: str, content_hash: str) -> int:
+def fetch_and_extract(url: str):
+    """抓取并解析单个页面，请求失败时返回 None"""
+    html = fetch(url)
+    if not html:
+        return None
+    return extract_page(html, url)
+
+
+def save_document_to_db(cur, url: str, title: str, content: str, content_hash: str) -> tuple:
     """
-    保存文档到数据库，返回 document_id
+    保存文档到数据库（由调用方提交事务）
     如果 content_hash 已存在，返回现有文档的 ID
+    
+    Returns:
+        (document_id, 该文档已有的 chunk 数)
     """
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            # 检查是否已存在相同 hash 的文档
-            cur.execute(
-                "SELECT id FROM public.document WHERE content_hash = %s",
-                (content_hash,)
-            )
-            existing = cur.fetchone()
-            
-            if existing:
-                doc_id = existing[0]
-                print(f"  文档已存在 (hash 相同)，ID: {doc_id}")
-                return doc_id
-            
-            # 插入新文档
-            cur.execute(
-                """
-                INSERT INTO public.document (source_url, title, content, content_hash)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-                """,
-                (url, title, content, content_hash)
-            )
-            doc_id = cur.fetchone()[0]
-            conn.commit()
-            print(f"  文档已保存，ID: {doc_id}")
-            return doc_id
-    finally:
-        conn.close()
+    # 一次往返完成查重、插入和已有 chunk 计数（依赖 content_hash 唯一索引）；
+    # xmax = 0 表示本次新插入，否则为命中已有文档
+    cur.execute(
+        """
+        WITH ins AS (
+            INSERT INTO public.document (source_url, title, content, content_hash)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (content_hash) DO UPDATE SET title = EXCLUDED.title
+            RETURNING id, (xmax = 0) AS inserted
+        )
+        SELECT
+            ins.id,
+            ins.inserted,
+            (SELECT COUNT(*) FROM public.document_chunk dc WHERE dc.document_id = ins.id)
+        FROM ins
+        """,
+        (url, title, content, content_hash)
+    )
+    doc_id, inserted, chunk_count = cur.fetchone()
+    
+    if inserted:
+        print(f"  文档已保存，ID: {doc_id}")
+    else:
+        print(f"  文档已存在 (hash 相同)，ID: {doc_id}")
+    return doc_id, chunk_count
 
 
-def save_chunks_to_db(document_id: int, chunks: list, embeddings_model):
+def _existing_doc_state(cur, content_hash: str):
     """
-    保存 chunks 到数据库，并生成 embeddings
+    按 content_hash 查询已入库文档
+
+    Returns:
+        (document_id, 已有 chunk 数)，文档不存在时返回 None
     """
-    if not chunks:
-        print("  没有 chunks 需要保存")
+    cur.execute(
+        """
+        SELECT d.id, (SELECT COUNT(*) FROM public.document_chunk dc WHERE dc.document_id = d.id)
+        FROM public.document d
+        WHERE d.content_hash = %s
+        """,
+        (content_hash,)
+    )
+    return cur.fetchone()
+
+
+def save_chunks_to_db(conn, chunk_rows: list, embeddings_model):
+    """
+    为 chunks 生成 embeddings 并保存到数据库
+
+    Args:
+        conn: 数据库连接（已注册 pgvector 适配器）
+        chunk_rows: [(document_id, chunk_index, chunk_text), ...]，可以来自多个文档
+        embeddings_model: embedding 模型
+    """
+    if not chunk_rows:
+        print("没有 chunks 需要保存")
         return
     
-    conn = get_db_connection()
-    try:
-        # 生成 embeddings
-        print(f"  正在生成 {len(chunks)} 个 chunks 的 embeddings...")
-        embeddings = embeddings_model.embed_documents(chunks)
-        
-        with conn.cursor() as cur:
-            # 逐个插入 chunks（因为 vector 类型需要特殊处理）
-            for idx, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
-                # 将 embedding 列表转换为 PostgreSQL vector 格式字符串
-                embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-                cur.execute(
-                    """
-                    INSERT INTO public.document_chunk (document_id, chunk_index, content, embedding)
-                    VALUES (%s, %s, %s, %s::vector)
-                    """,
-                    (document_id, idx, chunk_text, embedding_str)
-                )
-            conn.commit()
-            print(f"  {len(chunks)} 个 chunks 已保存并生成 embeddings")
-    finally:
-        conn.close()
-
-
-def process_and_save(data: dict, embeddings_model):
+    # 所有文档的 chunks 合并生成 embeddings（每个请求最多 EMBED_BATCH_SIZE 个）
+    print(f"正在生成 {len(chunk_rows)} 个 chunks 的 embeddings...")
+    # embedding 列为 halfvec(1024)，直接以 float16 写入（与库中存储的精度一致）
+    embeddings = np.asarray(
+        embeddings_model.embed_documents([text for _, _, text in chunk_rows]),
+        dtype=np.float16
+    )
+    
+    rows = [
+        (document_id, idx, chunk_text, embeddings[i])
+        for i, (document_id, idx, chunk_text) in enumerate(chunk_rows)
+    ]
+    
+    with conn.cursor() as cur:
+        # 一条多行 INSERT 写入所有 chunks（每 500 行一个语句），避免逐条往返
+        execute_values(
+            cur,
+            """
+            INSERT INTO public.document_chunk (document_id, chunk_index, content, embedding)
+            VALUES %s
+            """,
+            rows,
+            template="(%s, %s, %s, %s)",
+            page_size=500
+        )
+    conn.commit()
+    print(f"{len(chunk_rows)} 个 chunks 已保存并生成 embeddings")
+
+
+def prepare_document(conn, data: dict, seen_hashes: set) -> list:
     """
-    处理单个文档：计算 hash、保存到数据库、划分 chunks、生成 embeddings
+    处理单个文档：计算 hash、保存到数据库、划分 chunks
+    
+    Args:
+        conn: 数据库连接
+        data: 抓取结果（url / title / text）
+        seen_hashes: 本次运行已处理过的 content_hash，用于跳过重复内容
+    
+    Returns:
+        需要生成 embedding 的 chunks：[(document_id, chunk_index, chunk_text), ...]
     """
     url = data["url"]
     title = data["title"]
@@ -201,78 +288,125 @@ def process_and_save(data: dict, embeddings_model):
     
     if not text or not text.strip():
         print(f"跳过空内容: {url}")
-        return
+        return []
     
-    # 计算 content_hash
-    content_hash = calculate_hash(text)
+    # content_hash 在解析页面时已计算
+    content_hash = data.get("content_hash") or calculate_hash(text)
     print(f"处理文档: {title}")
     print(f"  URL: {url}")
     print(f"  Hash: {content_hash[:16]}...")
     
-    # 保存文档到数据库
-    doc_id = save_document_to_db(url, title, text, content_hash)
+    if content_hash in seen_hashes:
+        print("  本次运行中已处理过相同内容，跳过")
+        return []
+    seen_hashes.add(content_hash)
+    
+    # 先只读查询一次：内容未变化的页面不再写库，也不会划分 chunks 或请求 embedding
+    with conn.cursor() as cur:
+        state = _existing_doc_state(cur, content_hash)
+        if state is None:
+            doc_id, chunk_count = save_document_to_db(cur, url, title, text, content_hash)
+        else:
+            doc_id, chunk_count = state
+            print(f"  文档已存在 (hash 相同)，ID: {doc_id}")
+    conn.commit()
     
     # 检查是否需要更新 chunks（如果文档已存在且 hash 相同，可能不需要重新生成）
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT COUNT(*) FROM public.document_chunk WHERE document_id = %s",
-                (doc_id,)
-            )
-            chunk_count = cur.fetchone()[0]
-            
-            if chunk_count > 0:
-                print(f"  文档已有 {chunk_count} 个 chunks，跳过重新生成")
-                return
-    finally:
-        conn.close()
+    if chunk_count > 0:
+        print(f"  文档已有 {chunk_count} 个 chunks，跳过重新生成")
+        return []
     
     # 划分 chunks
     print(f"  正在划分 chunks...")
     chunks = split_text(text, chunk_size=500, chunk_overlap=100)
     print(f"  划分为 {len(chunks)} 个 chunks")
     
-    # 保存 chunks 并生成 embeddings
-    save_chunks_to_db(doc_id, chunks, embeddings_model)
+    return [(doc_id, idx, chunk_text) for idx, chunk_text in enumerate(chunks)]
 
 
-def spider():
-    """爬取数据并保存到数据库"""
+def process_and_save(data_list: list, embeddings_model):
+    """
+    处理一批文档：逐个保存文档并划分 chunks，再统一生成 embeddings 并批量写入
+    """
+    # 整个批次复用同一个数据库连接
+    conn = get_db_connection()
+    try:
+        # 注册 pgvector 适配器后可直接传入 numpy 数组，无需手工拼接 "[...]" 字符串
+        register_vector(conn)
+        
+        seen_hashes = set()
+        chunk_rows = []
+        for data in data_list:
+            try:
+                chunk_rows.extend(prepare_document(conn, data, seen_hashes))
+                print()
+            except Exception as e:
+                conn.rollback()
+                print(f"处理文档时出错: {e}\n")
+                import traceback
+                traceback.print_exc()
+        
+        save_chunks_to_db(conn, chunk_rows, embeddings_model)
+    finally:
+        conn.close()
+
+
+def _collect_pages(pages) -> list:
+    """过滤抓取失败的页面（None）"""
     results = []
-    for url in urls:
-        html = fetch(url)
-        if not html:
+    for data in pages:
+        if data is None:
             continue
-
-        data = parse_content(html, url)
-        data["url"] = url
         results.append(data)
+        print(f"抓取成功: {data['url']}")
+    return results
 
-        print(f"抓取成功: {url}")
-        time.sleep(1)
 
-    return results
+def spider():
+    """爬取数据并保存到数据库"""
+    # 抓取是网络 I/O 密集型，多线程并发请求并在各线程内完成解析；map 保持 urls 的原始顺序
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        return _collect_pages(executor.map(fetch_and_extract, urls))
+
+
+async def _fetch_async(session, url):
+    try:
+        async with session.get(url) as resp:
+            return await resp.text(errors="replace")
+    except Exception as e:
+        print(f"请求失败: {url} => {e}")
+        return ""
+
+
+async def spider_async():
+    """spider 的 asyncio 版本：单线程内重叠所有请求的 DNS/TCP/TLS 与等待时间（需要 pip install aiohttp）"""
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError("--async 需要安装: pip install aiohttp")
+
+    connector = aiohttp.TCPConnector(limit=FETCH_WORKERS)
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        pages = await asyncio.gather(*[_fetch_async(session, url) for url in urls])
+    return _collect_pages(extract_page(html, url) if html else None for url, html in zip(urls, pages))
 
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="爬取页面并写入数据库")
+    arg_parser.add_argument("--async", dest="use_async", action="store_true", help="使用 aiohttp 异步抓取")
+    args = arg_parser.parse_args()
+    
     # 获取 embedding 模型
     print("初始化 embedding 模型...")
     embeddings_model = get_embeddings_model()
     
     # 爬取数据
     print("开始爬取数据...")
-    data_list = spider()
+    data_list = asyncio.run(spider_async()) if args.use_async else spider()
     
-    # 处理并保存每个文档
+    # 处理并保存所有文档
     print("\n开始保存数据到数据库...")
-    for data in data_list:
-        try:
-            process_and_save(data, embeddings_model)
-            print()
-        except Exception as e:
-            print(f"处理文档时出错: {e}\n")
-            import traceback
-            traceback.print_exc()
+    process_and_save(data_list, embeddings_model)
     
     print("完成！")
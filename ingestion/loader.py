@@ -1,13 +1,20 @@
 """
 文档加载器 - 统一的文档加载接口
 """
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional
+import os
 from langchain.schema import Document
 
-from .parser import parse_file
+from .parser import parse_file, SUPPORTED_EXTENSIONS
 from .splitter import split_text, create_splitter
 
+# 解析以 CPU 为主的文件类型（pypdf / docx 解析），放到进程池；其余类型以 I/O 为主，用线程池
+CPU_BOUND_EXTENSIONS = frozenset({'.pdf', '.docx', '.doc'})
+
+_SUPPORTED_EXTENSIONS = frozenset(SUPPORTED_EXTENSIONS)
+
 
 def load_document(
     file_path: str,
@@ -59,7 +66,8 @@ def load_documents_from_directory(
     chunk_size: int = 500,
     chunk_overlap: int = 100,
     split: bool = True,
-    recursive: bool = True
+    recursive: bool = True,
+    max_workers: Optional[int] = None
 ) -> List[Document]:
     """
     从目录加载多个文档
@@ -70,6 +78,7 @@ def load_documents_from_directory(
         chunk_overlap: 分割时的重叠大小
         split: 是否分割文档
         recursive: 是否递归搜索子目录
+        max_workers: 并行加载的最大 worker 数，默认由 concurrent.futures 决定
     
     Returns:
         文档列表
@@ -78,26 +87,60 @@ def load_documents_from_directory(
     if not dir_path.exists() or not dir_path.is_dir():
         raise ValueError(f"目录不存在或不是目录: {directory}")
     
-    all_documents = []
+    # 查找所有支持的文件
+    file_paths = list(_walk_supported_files(str(dir_path), recursive))
     
-    # 支持的扩展名
-    from .parser import SUPPORTED_EXTENSIONS
-    extensions = list(SUPPORTED_EXTENSIONS.keys())
+    # 按类型分别提交到进程池 / 线程池并行加载，结果按文件原始顺序合并
+    results: List[Optional[List[Document]]] = [None] * len(file_paths)
+    cpu_bound, io_bound = [], []
+    for i, fp in enumerate(file_paths):
+        (cpu_bound if os.path.splitext(fp)[1].lower() in CPU_BOUND_EXTENSIONS else io_bound).append(i)
     
-    # 查找所有支持的文件
-    pattern = "**/*" if recursive else "*"
-    for file_path in dir_path.glob(pattern):
-        if file_path.is_file() and file_path.suffix.lower() in extensions:
-            try:
-                docs = load_document(
-                    str(file_path),
-                    chunk_size=chunk_size,
-                    chunk_overlap=chunk_overlap,
-                    split=split
-                )
-                all_documents.extend(docs)
-            except Exception as e:
-                print(f"警告: 加载文件失败 {file_path}: {e}")
-                continue
+    with ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+        process_pool = ProcessPoolExecutor(max_workers=max_workers) if cpu_bound else None
+        try:
+            futures = {}
+            for executor, indices in ((process_pool, cpu_bound), (thread_pool, io_bound)):
+                for i in indices:
+                    future = executor.submit(
+                        _load_document_worker, file_paths[i], chunk_size, chunk_overlap, split
+                    )
+                    futures[future] = i
+            
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"警告: 加载文件失败 {file_paths[i]}: {e}")
+        finally:
+            if process_pool is not None:
+                process_pool.shutdown()
+    
+    all_documents = []
+    for docs in results:
+        if docs:
+            all_documents.extend(docs)
     
     return all_documents
+
+
+def _walk_supported_files(root: str, recursive: bool) -> Iterator[str]:
+    """用 os.scandir 遍历目录，按扩展名提前过滤，只产出支持的文件路径"""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from _walk_supported_files(entry.path, recursive)
+            elif os.path.splitext(entry.name)[1].lower() in _SUPPORTED_EXTENSIONS and entry.is_file():
+                yield entry.path
+
+
+def _load_document_worker(
+    file_path: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    split: bool
+) -> List[Document]:
+    """进程池 / 线程池中执行的加载任务（需为模块级函数以便 pickle）"""
+    return load_document(file_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap, split=split)
@@ -1,34 +1,32 @@
 """
 文件解析器 - 支持多种文件格式的解析
 """
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, List
+import codecs
+import importlib
+import io
 import mimetypes
+import mmap
 
-# LangChain 文档加载器
-from langchain_community.document_loaders import (
-    TextLoader,
-    PyPDFLoader,
-    CSVLoader,
-    JSONLoader,
-    UnstructuredMarkdownLoader,
-    UnstructuredHTMLLoader,
-    UnstructuredWordDocumentLoader,
-)
-
-
+# LangChain 文档加载器："模块:类名"，首次用到时才导入（各加载器会引入 pypdf、unstructured 等重依赖）
 SUPPORTED_EXTENSIONS = {
-    '.txt': TextLoader,
-    '.md': UnstructuredMarkdownLoader,
-    '.pdf': PyPDFLoader,
-    '.csv': CSVLoader,
-    '.json': JSONLoader,
-    '.html': UnstructuredHTMLLoader,
-    '.htm': UnstructuredHTMLLoader,
-    '.docx': UnstructuredWordDocumentLoader,
-    '.doc': UnstructuredWordDocumentLoader,
+    '.txt': "langchain_community.document_loaders:TextLoader",
+    '.md': "langchain_community.document_loaders:UnstructuredMarkdownLoader",
+    '.pdf': "langchain_community.document_loaders:PyPDFLoader",
+    '.csv': "langchain_community.document_loaders:CSVLoader",
+    '.json': "langchain_community.document_loaders:JSONLoader",
+    '.html': "langchain_community.document_loaders:UnstructuredHTMLLoader",
+    '.htm': "langchain_community.document_loaders:UnstructuredHTMLLoader",
+    '.docx': "langchain_community.document_loaders:UnstructuredWordDocumentLoader",
+    '.doc': "langchain_community.document_loaders:UnstructuredWordDocumentLoader",
 }
 
+# 超过该大小的纯文本文件通过 mmap 分块解码，避免整份 bytes 与 str 同时驻留内存
+MMAP_THRESHOLD = 1024 * 1024
+MMAP_DECODE_CHUNK = 1024 * 1024
+
 
 def parse_file(file_path: str, encoding: str = "utf-8") -> str:
     """
@@ -55,7 +53,7 @@ def parse_file(file_path: str, encoding: str = "utf-8") -> str:
     if file_ext not in SUPPORTED_EXTENSIONS:
         raise ValueError(f"不支持的文件类型: {file_ext}")
     
-    loader_class = SUPPORTED_EXTENSIONS[file_ext]
+    loader_class = _get_loader_class(file_ext)
     
     # 特殊处理 JSON 文件
     if file_ext == '.json':
@@ -66,9 +64,20 @@ def parse_file(file_path: str, encoding: str = "utf-8") -> str:
     # 加载文档
     documents = loader.load()
     
-    # 合并所有文档的文本内容
-    texts = [doc.page_content for doc in documents]
-    return "\n\n".join(texts)
+    # 合并所有文档的文本内容（直接写入同一个缓冲区，不再构造中间列表）
+    buf = io.StringIO()
+    for i, doc in enumerate(documents):
+        if i:
+            buf.write("\n\n")
+        buf.write(doc.page_content)
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=None)
+def _get_loader_class(file_ext: str):
+    """按扩展名导入并缓存对应的加载器类"""
+    module_name, class_name = SUPPORTED_EXTENSIONS[file_ext].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
 
 
 def parse_file_simple(file_path: str, encoding: str = "utf-8") -> str:
@@ -87,10 +96,24 @@ def parse_file_simple(file_path: str, encoding: str = "utf-8") -> str:
     if not path.exists():
         raise FileNotFoundError(f"文件不存在: {file_path}")
     
+    if path.stat().st_size > MMAP_THRESHOLD:
+        return _read_text_mmap(path, encoding)
+    
     with open(path, 'r', encoding=encoding) as f:
         return f.read()
 
 
+def _read_text_mmap(path: Path, encoding: str) -> str:
+    """通过 mmap 分块增量解码大文本文件（换行符处理与文本模式 open 一致）"""
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+    buf = io.StringIO()
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in range(0, len(mm), MMAP_DECODE_CHUNK):
+            buf.write(decoder.decode(mm[start:start + MMAP_DECODE_CHUNK]))
+        buf.write(decoder.decode(b"", final=True))
+    return buf.getvalue()
+
+
 def get_supported_extensions() -> List[str]:
     """
     获取支持的文件扩展名列表
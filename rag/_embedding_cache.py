@@ -0,0 +1,61 @@
+"""
+Embedding 磁盘缓存 - 以内容哈希为键，文本未变化时不再请求 OpenAI
+
+键由 (model, dimension, 文本) 共同计算，更换模型或维度后自动失效。
+数据存放在 EMBEDDING_CACHE_DIR（默认 .cache/embeddings/）下按键前缀分片的 SQLite 文件中。
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+EMBEDDING_CACHE_DIR = Path(os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings"))
+
+# 分片数量（按键的第一个十六进制字符分片，减少单个文件的写锁竞争）
+_SHARD_COUNT = 16
+
+_connections: Dict[int, sqlite3.Connection] = {}
+_lock = threading.Lock()
+
+
+def make_key(model: str, dimension: Optional[int], text: str) -> str:
+    """计算缓存键：sha256(model|dimension|text)"""
+    return hashlib.sha256(f"{model}|{dimension}|{text}".encode("utf-8")).hexdigest()
+
+
+def _get_connection(key: str) -> sqlite3.Connection:
+    shard = int(key[0], 16) % _SHARD_COUNT
+    conn = _connections.get(shard)
+    if conn is None:
+        EMBEDDING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            str(EMBEDDING_CACHE_DIR / f"shard_{shard:02d}.sqlite3"),
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS embedding (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        _connections[shard] = conn
+    return conn
+
+
+def get(key: str) -> Optional[List[float]]:
+    """读取缓存的向量，不存在时返回 None"""
+    with _lock:
+        row = _get_connection(key).execute(
+            "SELECT vector FROM embedding WHERE key = ?", (key,)
+        ).fetchone()
+    if row is None:
+        return None
+    return array("d", row[0]).tolist()
+
+
+def put(key: str, vector: List[float]) -> None:
+    """写入向量（以 float64 原样保存，读取结果与 API 返回值完全一致）"""
+    blob = array("d", vector).tobytes()
+    with _lock:
+        conn = _get_connection(key)
+        conn.execute("INSERT OR REPLACE INTO embedding (key, vector) VALUES (?, ?)", (key, blob))
+        conn.commit()
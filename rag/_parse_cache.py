@@ -0,0 +1,51 @@
+"""
+文件解析结果缓存 - 文件未修改时直接复用上次解析出的文本
+
+每个文件对应 PARSE_CACHE_DIR（默认 .cache/parse/）下的一个 JSON 旁路文件，
+记录 (mtime, size, max_chars) 与解析文本，任一项不一致即视为失效。
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+PARSE_CACHE_DIR = Path(os.getenv("PARSE_CACHE_DIR", ".cache/parse"))
+
+
+def _sidecar_path(path: Path) -> Path:
+    digest = hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()
+    return PARSE_CACHE_DIR / f"{digest}.json"
+
+
+def get(path: Path, max_chars: int, stat: Optional[os.stat_result] = None) -> Optional[str]:
+    """返回缓存的解析文本；文件已修改或无缓存时返回 None（stat 为调用方已取得的文件状态）"""
+    try:
+        if stat is None:
+            stat = path.stat()
+        with open(_sidecar_path(path), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (entry.get("mtime"), entry.get("size"), entry.get("max_chars")) != (stat.st_mtime_ns, stat.st_size, max_chars):
+        return None
+    return entry.get("text")
+
+
+def put(path: Path, max_chars: int, text: str, stat: os.stat_result) -> None:
+    """
+    写入解析文本（先写临时文件再 os.replace，并发读取不会看到半个文件）
+
+    stat 必须是解析之前取得的文件状态：解析期间文件被修改时，缓存记录的是旧状态，下次读取即失效
+    """
+    entry = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "max_chars": max_chars, "text": text}
+    PARSE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=PARSE_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, _sidecar_path(path))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
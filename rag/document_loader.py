@@ -7,18 +7,23 @@ from langchain_community.document_loaders import (
     CSVLoader,
     JSONLoader,
 )
-from langchain_community.document_loaders import DirectoryLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, groupby
+from typing import Iterator, List, Optional
 from pathlib import Path
+import os
 
 
 def load_documents(
     file_path: str,
     file_type: Optional[str] = None,
     chunk_size: int = 1000,
-    chunk_overlap: int = 200
+    chunk_overlap: int = 200,
+    num_workers: Optional[int] = None,
+    use_multithreading: bool = False,
+    min_chunk_size: int = 100
 ) -> List[Document]:
     """
     加载文档并分割
@@ -28,6 +33,9 @@ def load_documents(
         file_type: 文件类型（txt, pdf, csv, json），如果为 None 则自动推断
         chunk_size: 文本块大小
         chunk_overlap: 文本块重叠大小
+        num_workers: 目录加载时的并行 worker 数，默认 CPU 核数 - 1
+        use_multithreading: 目录加载时使用线程池而非进程池（适合以 I/O 为主的小文件）
+        min_chunk_size: 短于该长度的文本块会并入相邻块，设为 0 则保留分割器原始结果
     
     Returns:
         文档列表
@@ -46,26 +54,136 @@ def load_documents(
         loader = _get_file_loader(str(path), file_type)
         documents = loader.load()
     else:
-        # 目录加载
-        glob_pattern = f"*.{file_type}" if file_type != "txt" else "*.txt"
-        loader = DirectoryLoader(
-            str(path),
-            glob=glob_pattern,
-            loader_cls=_get_loader_class(file_type),
-        )
-        documents = loader.load()
+        # 目录加载：各文件在 worker 中并行解析（PDF 等解析以 CPU 为主，默认用进程池绕开 GIL）
+        _get_loader_class(file_type)  # 提前校验文件类型
+        file_paths = list(_iter_files(str(path), f".{file_type.lower()}"))
+        if len(file_paths) <= 1:
+            # 没有可并行的文件时直接在当前进程加载，省去启动进程池的开销
+            documents = list(chain.from_iterable(_load_one(p, file_type) for p in file_paths))
+        else:
+            if num_workers is None:
+                num_workers = max(1, (os.cpu_count() or 1) - 1)
+            executor_cls = ThreadPoolExecutor if use_multithreading else ProcessPoolExecutor
+            with executor_cls(max_workers=num_workers) as executor:
+                documents = list(chain.from_iterable(
+                    executor.map(_load_one, file_paths, [file_type] * len(file_paths))
+                ))
     
-    # 分割文档
+    # 合并后统一分割文档（记录每块在原文中的起始位置，合并相邻块时据此去掉重叠部分）
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
+        add_start_index=True,
     )
     splits = text_splitter.split_documents(documents)
     
+    if min_chunk_size > 0:
+        splits = _split_then_merge(
+            splits,
+            text_splitter,
+            target=chunk_size,
+            min_size=min_chunk_size,
+            hard_max=chunk_size + min_chunk_size,
+        )
+    
     return splits
 
 
+def _source_key(doc: Document) -> dict:
+    """相邻块的分组键：来源元数据（同一文件 / 同一页），忽略各块不同的 start_index"""
+    return {k: v for k, v in doc.metadata.items() if k != "start_index"}
+
+
+def _split_then_merge(
+    docs: List[Document],
+    splitter: RecursiveCharacterTextSplitter,
+    target: int,
+    min_size: int,
+    hard_max: int
+) -> List[Document]:
+    """
+    对分割结果做后处理，减少零碎的小块（每个块都要一次 embedding 并占用一个检索名额）
+
+    只在来源相同（同一文件 / 同一页）的相邻块之间进行：
+    1. 超过 hard_max 的块按同样的分割符级联重新分割
+    2. 相邻块合并后不超过 target 时贪心合并
+    3. 仍短于 min_size 的块并入前一个（或后一个）块，合并后不超过 hard_max
+
+    块以 (文本, 起始位置) 表示，起始位置未知时为 -1
+    """
+    result = []
+    for _, group in groupby(docs, key=_source_key):
+        group = list(group)
+        metadata = _source_key(group[0])
+        
+        pieces = []
+        for doc in group:
+            start = doc.metadata.get("start_index", -1)
+            if len(doc.page_content) > hard_max:
+                for sub in splitter.create_documents([doc.page_content]):
+                    sub_start = sub.metadata.get("start_index", -1)
+                    pieces.append((sub.page_content, start + sub_start if start >= 0 and sub_start >= 0 else -1))
+            else:
+                pieces.append((doc.page_content, start))
+        
+        merged = []
+        for piece in pieces:
+            if merged and len(merged[-1][0]) + len(piece[0]) <= target:
+                merged[-1] = _join_chunks(merged[-1], piece)
+            else:
+                merged.append(piece)
+        
+        compacted = []
+        for i, piece in enumerate(merged):
+            if len(piece[0]) < min_size:
+                if compacted and len(compacted[-1][0]) + len(piece[0]) <= hard_max:
+                    compacted[-1] = _join_chunks(compacted[-1], piece)
+                    continue
+                if i + 1 < len(merged) and len(piece[0]) + len(merged[i + 1][0]) <= hard_max:
+                    merged[i + 1] = _join_chunks(piece, merged[i + 1])
+                    continue
+            compacted.append(piece)
+        
+        for text, start in compacted:
+            doc_metadata = dict(metadata)
+            if start >= 0:
+                doc_metadata["start_index"] = start
+            result.append(Document(page_content=text, metadata=doc_metadata))
+    return result
+
+
+def _join_chunks(left: tuple, right: tuple) -> tuple:
+    """
+    拼接相邻块，只去掉分割器实际产生的重叠部分（由两块的起始位置算出），
+    不相交或位置未知的块直接换行拼接
+    """
+    left_text, left_start = left
+    right_text, right_start = right
+    if left_start >= 0 and right_start >= 0:
+        overlap = left_start + len(left_text) - right_start
+        if 0 < overlap <= len(right_text) and left_text.endswith(right_text[:overlap]):
+            return left_text + right_text[overlap:], left_start
+    return left_text + "\n" + right_text, left_start
+
+
+def _iter_files(root: str, ext: str) -> Iterator[str]:
+    """
+    用 os.scandir 列出目录下指定扩展名的文件（复用 DirEntry 缓存的类型信息，不再逐个 stat）
+
+    与 DirectoryLoader 默认行为一致，跳过以 "." 开头的隐藏文件（如 ._foo.pdf、.~lock.x.txt）
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.name.startswith(".") and entry.name.lower().endswith(ext) and entry.is_file():
+                yield entry.path
+
+
+def _load_one(file_path: str, file_type: str) -> List[Document]:
+    """加载单个文件（模块级函数，可被进程池 pickle）"""
+    return _get_file_loader(file_path, file_type).load()
+
+
 def _get_file_loader(file_path: str, file_type: str):
     """根据文件类型获取对应的加载器"""
     loader_map = {
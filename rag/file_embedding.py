@@ -2,16 +2,25 @@
 OpenAI Embedding 辅助模块
 """
 
+import hashlib
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 from openai import OpenAI
 
+from app.utils.http_client import get_http_client
+
+from . import _embedding_cache, _parse_cache
+
 
 DEFAULT_MODEL = "text-embedding-3-large"
 DEFAULT_DIMENSION = 1024
 
+# 计算文件内容哈希时每次读取的字节数
+HASH_READ_SIZE = 1 << 20
+
 
 def _get_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> OpenAI:
     key = api_key or os.getenv("OPENAI_API_KEY")
@@ -19,29 +28,63 @@ def _get_openai_client(api_key: Optional[str] = None, base_url: Optional[str] =
         raise RuntimeError("缺少 OPENAI_API_KEY")
 
     base = base_url or os.getenv("OPENAI_BASE_URL")
-    return OpenAI(api_key=key, base_url=base) if base else OpenAI(api_key=key)
+    return _create_openai_client(key, base)
+
+
+@lru_cache(maxsize=None)
+def _create_openai_client(api_key: str, base_url: Optional[str]) -> OpenAI:
+    # 相同 (api_key, base_url) 复用同一个客户端，所有客户端共享一个 httpx 连接池
+    kwargs: Dict[str, Any] = {"api_key": api_key, "http_client": get_http_client()}
+    if base_url:
+        kwargs["base_url"] = base_url
+    return OpenAI(**kwargs)
 
 
 def _read_file_text(file_path: str, max_chars: int) -> str:
     from tools.moodle_mcp.core.file_parser import parse_file_for_llm
 
-    content = parse_file_for_llm(Path(file_path), max_chars=max_chars)
+    path = Path(file_path)
+    # 解析前先取文件状态，缓存以它为准
+    stat = path.stat()
+    content = _parse_cache.get(path, max_chars, stat)
+    if content is None:
+        content = parse_file_for_llm(path, max_chars=max_chars)
+        if content:
+            _parse_cache.put(path, max_chars, content, stat)
     if not content or not content.strip():
         raise ValueError("文件内容为空，无法生成 embedding")
     return content
 
 
 def generate_file_embedding(
-    file_path: str,
+    file_path: Optional[str] = None,
     openai_api_key: Optional[str] = None,
     model: str = DEFAULT_MODEL,
     dimension: int = DEFAULT_DIMENSION,
     max_chars: int = 8000,
+    use_cache: bool = True,
+    text: Optional[str] = None,
 ) -> List[float]:
     """
     读取文件并生成 OpenAI embedding。
+
+    调用方已解析过文件时可直接传入 text（截断到 max_chars），不再重复解析 file_path。
+    use_cache 为 True 时按 (model, dimension, 文本) 查询磁盘缓存，命中则不请求 API。
     """
-    text = _read_file_text(file_path, max_chars)
+    if text is not None:
+        text = text[:max_chars]
+        if not text.strip():
+            raise ValueError("文件内容为空，无法生成 embedding")
+    elif file_path is not None:
+        text = _read_file_text(file_path, max_chars)
+    else:
+        raise ValueError("file_path 与 text 至少需要提供一个")
+    cache_key = _embedding_cache.make_key(model, dimension, text) if use_cache else None
+    if cache_key:
+        cached = _embedding_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     client = _get_openai_client(openai_api_key)
     kwargs: Dict[str, Any] = {
         "model": model,
@@ -51,10 +94,22 @@ def generate_file_embedding(
         kwargs["dimensions"] = dimension
 
     resp = client.embeddings.create(**kwargs)
-    return resp.data[0].embedding
+    embedding = resp.data[0].embedding
+    if cache_key:
+        _embedding_cache.put(cache_key, embedding)
+    return embedding
+
+
+def _file_content_hash(file_path: str) -> str:
+    """分块计算文件内容的 sha256，大文件不会一次性读入内存"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
-def save_embedding_to_db(file_id: int, embedding: List[float]) -> bool:
+def save_embedding_to_db(file_id: int, embedding: List[float], content_hash: Optional[str] = None) -> bool:
     from db.session import SessionLocal
     from db.tables.moodle_files import MoodleFile
 
@@ -63,6 +118,8 @@ def save_embedding_to_db(file_id: int, embedding: List[float]) -> bool:
         if not record:
             raise ValueError(f"未找到文件 ID: {file_id}")
         record.vector = embedding
+        if content_hash is not None and hasattr(MoodleFile, "content_hash"):
+            record.content_hash = content_hash
         session.commit()
         return True
 
@@ -75,14 +132,27 @@ def generate_and_save_embedding(
     dimension: int = DEFAULT_DIMENSION,
     max_chars: int = 8000,
     skip_if_exists: bool = True,
+    text: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """
+    生成并保存单个文件的 embedding。
+
+    skip_if_exists 为 True 时，已有向量且文件内容哈希未变化才跳过；
+    MoodleFile 没有 content_hash 列时退化为只判断向量是否存在。
+    text 为已解析好的文件文本，提供时不再重新解析文件。
+    """
     from db.session import SessionLocal
     from db.tables.moodle_files import MoodleFile
 
+    has_hash_column = hasattr(MoodleFile, "content_hash")
+    content_hash = _file_content_hash(file_path) if has_hash_column else None
+
     if skip_if_exists:
         with SessionLocal() as session:
             record = session.query(MoodleFile).filter(MoodleFile.id == file_id).first()
-            if record and record.vector is not None:
+            if record and record.vector is not None and (
+                not has_hash_column or record.content_hash == content_hash
+            ):
                 return {"success": True, "file_id": file_id, "skipped": True}
 
     embedding = generate_file_embedding(
@@ -91,9 +161,10 @@ def generate_and_save_embedding(
         model=model,
         dimension=dimension,
         max_chars=max_chars,
+        text=text,
     )
 
-    save_embedding_to_db(file_id, embedding)
+    save_embedding_to_db(file_id, embedding, content_hash)
     return {
         "success": True,
         "file_id": file_id,
@@ -102,6 +173,130 @@ def generate_and_save_embedding(
     }
 
 
+def generate_and_save_embeddings_batch(
+    file_ids: List[int],
+    file_paths: List[str],
+    openai_api_key: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+    dimension: int = DEFAULT_DIMENSION,
+    max_chars: int = 8000,
+    skip_if_exists: bool = True,
+    batch_size: int = 96,
+    use_cache: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    批量生成并保存多个文件的 embedding。
+
+    每个 API 请求最多携带 batch_size 个文本，每批结果在一个事务中批量写回 MoodleFile.vector
+    （及 content_hash）。skip_if_exists 的判断方式与 generate_and_save_embedding 相同。
+    返回与 file_ids 一一对应的结果列表，单个文件失败不影响其他文件。
+    """
+    from db.session import SessionLocal
+    from db.tables.moodle_files import MoodleFile
+
+    if len(file_ids) != len(file_paths):
+        raise ValueError("file_ids 与 file_paths 长度不一致")
+
+    results: Dict[int, Dict[str, Any]] = {}
+
+    # 与 generate_and_save_embedding 一致：有 content_hash 列时按文件内容哈希判断是否变化
+    has_hash_column = hasattr(MoodleFile, "content_hash")
+    content_hashes: Dict[int, str] = {}
+    if has_hash_column:
+        for file_id, file_path in zip(file_ids, file_paths):
+            try:
+                content_hashes[file_id] = _file_content_hash(file_path)
+            except OSError as e:
+                results[file_id] = {"success": False, "file_id": file_id, "error": str(e)}
+
+    if skip_if_exists:
+        with SessionLocal() as session:
+            if has_hash_column:
+                existing = session.query(MoodleFile.id, MoodleFile.content_hash).filter(
+                    MoodleFile.id.in_(file_ids), MoodleFile.vector.isnot(None)
+                ).all()
+            else:
+                existing = [(file_id, None) for (file_id,) in session.query(MoodleFile.id).filter(
+                    MoodleFile.id.in_(file_ids), MoodleFile.vector.isnot(None)
+                ).all()]
+        for file_id, stored_hash in existing:
+            if file_id in results:
+                continue
+            if not has_hash_column or stored_hash == content_hashes.get(file_id):
+                results[file_id] = {"success": True, "file_id": file_id, "skipped": True}
+
+    def save_batch(batch: List[Tuple[int, List[float]]]) -> None:
+        """在一个事务中写回一批向量并记录结果；写入失败时这一批记为失败"""
+        mappings = []
+        for file_id, embedding in batch:
+            row: Dict[str, Any] = {"id": file_id, "vector": embedding}
+            if has_hash_column:
+                row["content_hash"] = content_hashes[file_id]
+            mappings.append(row)
+        try:
+            with SessionLocal() as session:
+                session.bulk_update_mappings(MoodleFile, mappings)
+                session.commit()
+        except Exception as e:
+            for file_id, _ in batch:
+                results[file_id] = {"success": False, "file_id": file_id, "error": str(e)}
+            return
+        for file_id, embedding in batch:
+            results[file_id] = {
+                "success": True,
+                "file_id": file_id,
+                "embedding_length": len(embedding),
+                "skipped": False,
+            }
+
+    # 读取文本，磁盘缓存命中的直接使用，其余进入待请求队列
+    cached_items: List[Tuple[int, List[float]]] = []
+    pending = []
+    for file_id, file_path in zip(file_ids, file_paths):
+        if file_id in results:
+            continue
+        try:
+            text = _read_file_text(file_path, max_chars)
+        except Exception as e:
+            results[file_id] = {"success": False, "file_id": file_id, "error": str(e)}
+            continue
+        cache_key = _embedding_cache.make_key(model, dimension, text) if use_cache else None
+        cached = _embedding_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            cached_items.append((file_id, cached))
+        else:
+            pending.append((file_id, text, cache_key))
+
+    for start in range(0, len(cached_items), batch_size):
+        save_batch(cached_items[start:start + batch_size])
+
+    # 每批请求完成后立即写回数据库；某一批请求失败只把这一批记为失败，不影响已完成和后续的批次
+    client = _get_openai_client(openai_api_key) if pending else None
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        kwargs: Dict[str, Any] = {
+            "model": model,
+            "input": [text for _, text, _ in batch],
+        }
+        if dimension:
+            kwargs["dimensions"] = dimension
+        try:
+            resp = client.embeddings.create(**kwargs)
+        except Exception as e:
+            for file_id, _, _ in batch:
+                results[file_id] = {"success": False, "file_id": file_id, "error": str(e)}
+            continue
+        batch_embeddings = []
+        for item in resp.data:
+            file_id, _, cache_key = batch[item.index]
+            batch_embeddings.append((file_id, item.embedding))
+            if cache_key:
+                _embedding_cache.put(cache_key, item.embedding)
+        save_batch(batch_embeddings)
+
+    return [results[file_id] for file_id in file_ids]
+
+
 if __name__ == "__main__":
     sample_text = "今天是一个美好的一天，我在学习如何使用 embedding API。"
     client = _get_openai_client()
@@ -4,16 +4,120 @@
 使用轻量级库支持多种文档格式，提取文本内容供 LLM 分析
 
 依赖:
-    pip install PyPDF2 python-docx python-pptx markdown
+    pip install PyMuPDF pypdf python-docx python-pptx markdown
+    （未安装 PyMuPDF 时 PDF 回退到 pypdf，旧环境中的 PyPDF2 也可使用）
 """
 
+import io
 import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import mimetypes
 
 logger = logging.getLogger(__name__)
 
+# 可选依赖在模块加载时导入一次（未安装的为 None，用到时再提示安装）
+try:
+    import fitz as _fitz
+except ImportError:
+    _fitz = None
+
+try:
+    from pypdf import PdfReader as _PdfReader
+except ImportError:
+    try:
+        from PyPDF2 import PdfReader as _PdfReader
+    except ImportError:
+        _PdfReader = None
+
+try:
+    from pptx import Presentation as _Presentation
+except ImportError:
+    _Presentation = None
+
+try:
+    from docx import Document as _DocxDocument
+    from docx.oxml.ns import qn as _qn
+    _W_TC, _W_P, _W_T = _qn("w:tc"), _qn("w:p"), _qn("w:t")
+    _W_TAB, _W_BR, _W_CR, _W_TYPE = _qn("w:tab"), _qn("w:br"), _qn("w:cr"), _qn("w:type")
+    _W_SDT, _W_SDT_CONTENT = _qn("w:sdt"), _qn("w:sdtContent")
+    _W_TC_PR, _W_GRID_SPAN, _W_V_MERGE = _qn("w:tcPr"), _qn("w:gridSpan"), _qn("w:vMerge")
+except ImportError:
+    _DocxDocument = None
+
+# 段落分隔：一个或多个空行（允许空行中含空白字符）
+_PARA_RE = re.compile(r'\n\s*\n+')
+
+# PDF 按页并行提取：每个任务处理的页数，以及进程池 worker 数（设为 1 则始终串行）
+PDF_CHUNK_SIZE = int(os.getenv("PDF_CHUNK_SIZE", "8"))
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+# PDF 解析后端："auto"（默认，优先 PyMuPDF，未安装时回退 pypdf）、"pymupdf" 或 "pypdf"
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto").lower()
+
+
+def _extract_pdf_pages(path_str: str, start: int, end: int, reader=None) -> List[Tuple[int, str]]:
+    """提取 PDF 第 start 到 end-1 页的文本（模块级函数，供进程池调用；串行时可传入已打开的 reader）"""
+    if reader is None:
+        reader = _PdfReader(path_str)
+    pages = []
+    for page_idx in range(start, end):
+        try:
+            pages.append((page_idx, reader.pages[page_idx].extract_text()))
+        except Exception as e:
+            logger.warning(f"⚠️  页面 {page_idx + 1} 提取失败: {e}")
+    return pages
+
+
+def _docx_row_cells(tr) -> List[Any]:
+    """表格行中的 w:tc 节点，包括被内容控件（w:sdt/w:sdtContent）包裹的单元格"""
+    cells = []
+    for child in tr.iterchildren(_W_TC, _W_SDT):
+        if child.tag == _W_TC:
+            cells.append(child)
+        else:
+            for content in child.iterchildren(_W_SDT_CONTENT):
+                cells.extend(content.iterchildren(_W_TC))
+    return cells
+
+
+def _docx_has_merge(tcs: List[Any]) -> bool:
+    """行内是否有横向（gridSpan）或纵向（vMerge）合并的单元格"""
+    for tc in tcs:
+        tc_pr = tc.find(_W_TC_PR)
+        if tc_pr is not None and (tc_pr.find(_W_GRID_SPAN) is not None or tc_pr.find(_W_V_MERGE) is not None):
+            return True
+    return False
+
+
+def _docx_paragraph_text(p) -> str:
+    """段落文本：与 python-docx 的 Paragraph.text 一致，w:tab 记为制表符，换行（w:br/w:cr）记为换行符"""
+    parts = []
+    for el in p.iter(_W_T, _W_TAB, _W_BR, _W_CR):
+        if el.tag == _W_T:
+            parts.append(el.text or "")
+        elif el.tag == _W_TAB:
+            parts.append("\t")
+        elif el.tag == _W_CR or el.get(_W_TYPE, "textWrapping") == "textWrapping":
+            # 分页符 / 分栏符不产生文本
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _docx_cell_text(tc) -> str:
+    return "\n".join(_docx_paragraph_text(p) for p in tc.iterchildren(_W_P)).strip()
+
+
+def _write_section(buf: io.StringIO, *parts: str) -> None:
+    """向 buf 追加一段内容，段与段之间以空行分隔（等价于 "\n\n".join，但不构造中间字符串）"""
+    if buf.tell():
+        buf.write("\n\n")
+    for part in parts:
+        buf.write(part)
+
 
 class FileParser:
     """文件解析器 - 使用轻量级库支持多种文档格式"""
@@ -22,9 +126,14 @@ class FileParser:
         '.pdf', '.ppt', '.pptx', '.docx', '.md', '.txt'
     }
     
-    def __init__(self):
-        """初始化文件解析器"""
-        pass  # 不需要预先检查依赖，按需导入
+    def __init__(self, pdf_backend: Optional[str] = None):
+        """
+        初始化文件解析器（依赖在模块加载时已尝试导入，缺失的在用到时提示安装）
+        
+        Args:
+            pdf_backend: PDF 解析后端，默认取 PDF_BACKEND 环境变量
+        """
+        self.pdf_backend = (pdf_backend or PDF_BACKEND).lower()
     
     def parse_file(
         self,
@@ -123,79 +232,117 @@ class FileParser:
             }
     
     def _parse_pdf(self, path: Path, extract_tables: bool = True) -> str:
-        """解析 PDF 文件 - 使用 PyPDF2"""
-        try:
-            from PyPDF2 import PdfReader
-        except ImportError:
-            raise ImportError("请安装 PyPDF2: pip install PyPDF2")
-        
+        """解析 PDF 文件 - 优先使用 PyMuPDF，回退到 pypdf"""
+        if self.pdf_backend in ("auto", "pymupdf"):
+            if _fitz is not None:
+                return self._parse_pdf_pymupdf(path)
+            if self.pdf_backend == "pymupdf":
+                raise ImportError("请安装 PyMuPDF: pip install PyMuPDF")
+        return self._parse_pdf_pypdf(path)
+    
+    def _parse_pdf_pymupdf(self, path: Path) -> str:
+        """解析 PDF 文件 - 使用 PyMuPDF（C 实现，通常比 pypdf 快一个数量级）"""
         logger.info(f"📄 正在解析 PDF: {path.name}")
         
-        reader = PdfReader(str(path))
-        texts = []
+        buf = io.StringIO()
+        with _fitz.open(str(path)) as doc:
+            for page_num, page in enumerate(doc, 1):
+                try:
+                    text = page.get_text("text")
+                    if text.strip():
+                        _write_section(buf, f"=== 第 {page_num} 页 ===\n", text)
+                except Exception as e:
+                    logger.warning(f"⚠️  页面 {page_num} 提取失败: {e}")
         
-        for page_num, page in enumerate(reader.pages, 1):
-            try:
-                text = page.extract_text()
-                if text.strip():
-                    texts.append(f"=== 第 {page_num} 页 ===\n{text}")
-            except Exception as e:
-                logger.warning(f"⚠️  页面 {page_num} 提取失败: {e}")
+        return buf.getvalue()
+    
+    def _parse_pdf_pypdf(self, path: Path) -> str:
+        """解析 PDF 文件 - 使用 pypdf（纯 Python 实现）"""
+        if _PdfReader is None:
+            raise ImportError("请安装 PyMuPDF 或 pypdf: pip install PyMuPDF pypdf")
+        
+        logger.info(f"📄 正在解析 PDF: {path.name}")
+        reader = _PdfReader(str(path))
+        page_count = len(reader.pages)
         
-        return "\n\n".join(texts)
+        if PDF_PARSE_WORKERS <= 1 or page_count <= PDF_CHUNK_SIZE:
+            pages = _extract_pdf_pages(str(path), 0, page_count, reader)
+        else:
+            # 页数较多时按 PDF_CHUNK_SIZE 分段提交到进程池，各进程独立打开文件并提取
+            starts = range(0, page_count, PDF_CHUNK_SIZE)
+            ends = [min(start + PDF_CHUNK_SIZE, page_count) for start in starts]
+            workers = min(PDF_PARSE_WORKERS, len(ends))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pages = [
+                    page
+                    for chunk in executor.map(_extract_pdf_pages, [str(path)] * len(ends), starts, ends)
+                    for page in chunk
+                ]
+        
+        buf = io.StringIO()
+        for page_idx, text in pages:
+            if text.strip():
+                _write_section(buf, f"=== 第 {page_idx + 1} 页 ===\n", text)
+        
+        return buf.getvalue()
     
     def _parse_ppt(self, path: Path) -> str:
         """解析 PPT/PPTX 文件 - 使用 python-pptx"""
-        try:
-            from pptx import Presentation
-        except ImportError:
+        if _Presentation is None:
             raise ImportError("请安装 python-pptx: pip install python-pptx")
         
         logger.info(f"📊 正在解析 PowerPoint: {path.name}")
         
-        prs = Presentation(str(path))
-        texts = []
+        prs = _Presentation(str(path))
+        buf = io.StringIO()
         
         for slide_num, slide in enumerate(prs.slides, 1):
-            slide_texts = [f"=== 幻灯片 {slide_num} ==="]
-            
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text:
-                    slide_texts.append(shape.text)
-            
-            if len(slide_texts) > 1:
-                texts.append("\n".join(slide_texts))
-        
-        return "\n\n".join(texts)
+            shape_texts = [
+                shape.text for shape in slide.shapes
+                if hasattr(shape, "text") and shape.text
+            ]
+            if shape_texts:
+                _write_section(buf, f"=== 幻灯片 {slide_num} ===")
+                for text in shape_texts:
+                    buf.write("\n")
+                    buf.write(text)
+        
+        return buf.getvalue()
     
     def _parse_docx(self, path: Path) -> str:
         """解析 Word 文件 - 使用 python-docx"""
-        try:
-            from docx import Document
-        except ImportError:
+        if _DocxDocument is None:
             raise ImportError("请安装 python-docx: pip install python-docx")
         
         logger.info(f"📝 正在解析 Word 文档: {path.name}")
         
-        doc = Document(str(path))
-        texts = []
+        doc = _DocxDocument(str(path))
+        buf = io.StringIO()
         
         # 提取段落
         for para in doc.paragraphs:
-            if para.text.strip():
-                texts.append(para.text)
+            text = para.text
+            if text.strip():
+                _write_section(buf, text)
         
-        # 提取表格
+        # 提取表格（直接遍历 lxml 节点取文本，不构造 python-docx 的 Cell/Paragraph 对象；
+        # 含合并单元格的行仍使用 row.cells，保持合并单元格按网格列重复输出的布局）
         for table in doc.tables:
-            table_texts = []
+            header_written = False
             for row in table.rows:
-                row_text = " | ".join(cell.text.strip() for cell in row.cells)
+                tcs = _docx_row_cells(row._tr)
+                if _docx_has_merge(tcs):
+                    row_text = " | ".join(cell.text.strip() for cell in row.cells)
+                else:
+                    row_text = " | ".join(_docx_cell_text(tc) for tc in tcs)
                 if row_text.strip():
-                    table_texts.append(row_text)
-            if table_texts:
-                texts.append("\n表格内容:\n" + "\n".join(table_texts))
+                    if not header_written:
+                        _write_section(buf, "\n表格内容:")
+                        header_written = True
+                    buf.write("\n")
+                    buf.write(row_text)
         
-        return "\n\n".join(texts)
+        return buf.getvalue()
     
     def _parse_markdown(self, path: Path) -> str:
         """解析 Markdown 文件"""
@@ -208,17 +355,20 @@ class FileParser:
         """解析纯文本文件"""
         logger.info(f"📃 正在解析文本文件: {path.name}")
         
-        # 尝试多种编码
+        # 只读取一次文件，在同一份 bytes 上依次尝试多种编码
+        data = path.read_bytes()
         encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
         
         for encoding in encodings:
             try:
-                return path.read_text(encoding=encoding)
+                text = data.decode(encoding)
             except UnicodeDecodeError:
                 continue
+            # 与文本模式读取一致：统一换行符为 \n
+            return text.replace('\r\n', '\n').replace('\r', '\n')
         
         # 如果都失败，使用 errors='ignore'
-        return path.read_text(encoding='utf-8', errors='ignore')
+        return data.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
     
     def _extract_text_from_elements(self, text: str) -> str:
         """兼容接口 - 直接返回文本"""
@@ -226,16 +376,15 @@ class FileParser:
     
     def _serialize_elements(self, text: str) -> List[Dict[str, Any]]:
         """序列化为元素列表（简化版）"""
-        # 简单按段落分割
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-        
+        # 简单按段落（空行，包括只含空白的行）分割，单次遍历
         return [
             {
                 "type": "Paragraph",
                 "text": para,
                 "category": "text"
             }
-            for para in paragraphs
+            for para in map(str.strip, _PARA_RE.split(text))
+            if para
         ]
     
     def get_file_info(self, file_path: str) -> Dict[str, Any]:
@@ -443,19 +592,30 @@ def extract_text_from_pptx(pptx_path: str, max_chars: Optional[int] = None) -> s
     return parse_file_for_llm(pptx_path, max_chars=max_chars or 50000)
 
 
-def batch_parse_files(file_paths: List[str]) -> List[Dict[str, Any]]:
-    """批量解析多个文件"""
-    parser = FileParser()
-    results = []
-    
-    for file_path in file_paths:
-        result = parser.parse_file(file_path)
-        results.append({
-            "file": file_path,
-            **result
-        })
-    
-    return results
+def _parse_one(file_path: str) -> Dict[str, Any]:
+    """解析单个文件（模块级函数，供进程池调用）"""
+    return {
+        "file": file_path,
+        **FileParser().parse_file(file_path)
+    }
+
+
+def _init_batch_worker() -> None:
+    # 文件之间已经并行，worker 内的 PDF 按页解析改为串行，避免进程数成倍膨胀
+    global PDF_PARSE_WORKERS
+    PDF_PARSE_WORKERS = 1
+
+
+def batch_parse_files(file_paths: List[str], max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """批量解析多个文件（进程池并行，结果顺序与 file_paths 一致）"""
+    if len(file_paths) <= 1:
+        return [_parse_one(file_path) for file_path in file_paths]
+    
+    with ProcessPoolExecutor(
+        max_workers=max_workers or min(len(file_paths), os.cpu_count() or 1),
+        initializer=_init_batch_worker
+    ) as executor:
+        return list(executor.map(_parse_one, file_paths))
 
 
 if __name__ == "__main__":
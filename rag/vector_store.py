@@ -3,16 +3,28 @@
 """
 from langchain_community.vectorstores import PGVector
 from langchain_openai import OpenAIEmbeddings
+import os
+from functools import lru_cache
 from typing import Optional
 from app.config import settings
+from app.utils.http_client import get_http_client
 
+# PGVector 内部 SQLAlchemy engine 的连接池参数（实例按集合缓存，连接在多次调用间复用）
+PGVECTOR_ENGINE_ARGS = {
+    "pool_size": int(os.getenv("PGVECTOR_POOL_SIZE", "10")),
+    "pool_recycle": int(os.getenv("PGVECTOR_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": True,
+}
 
+
+@lru_cache(maxsize=1)
 def get_embeddings() -> OpenAIEmbeddings:
-    """获取嵌入模型"""
+    """获取嵌入模型（进程内复用同一个实例及其 HTTP 连接池）"""
     return OpenAIEmbeddings(
         model=settings.EMBEDDING_MODEL,
         openai_api_key=settings.OPENAI_API_KEY,
         openai_api_base=settings.OPENAI_API_BASE,
+        http_client=get_http_client(),
     )
 
 
@@ -28,22 +40,33 @@ def get_vector_store(
         embeddings: 嵌入模型，如果不提供则使用默认的
     
     Returns:
-        PGVector 向量存储实例
+        PGVector 向量存储实例（使用默认嵌入模型时，同一集合复用同一个实例）
     """
-    if embeddings is None:
-        embeddings = get_embeddings()
-    
     if collection_name is None:
         collection_name = settings.VECTOR_TABLE_NAME
     
-    # 构建连接字符串
-    connection_string = (
-        f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
-        f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
-    )
-    
+    if embeddings is None:
+        return _get_vector_store_cached(collection_name)
+    return _create_vector_store(collection_name, embeddings)
+
+
+@lru_cache(maxsize=8)
+def _get_vector_store_cached(collection_name: str) -> PGVector:
+    return _create_vector_store(collection_name, get_embeddings())
+
+
+def _create_vector_store(collection_name: str, embeddings: OpenAIEmbeddings) -> PGVector:
     return PGVector(
-        connection_string=connection_string,
+        connection_string=_connection_string(),
         embedding_function=embeddings,
         collection_name=collection_name,
+        engine_args=PGVECTOR_ENGINE_ARGS,
+    )
+
+
+@lru_cache(maxsize=1)
+def _connection_string() -> str:
+    return (
+        f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
+        f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
     )
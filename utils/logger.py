@@ -3,9 +3,12 @@
 """
 import logging
 import sys
+from functools import lru_cache
+from typing import Optional
 from app.config import settings
 
 
+@lru_cache(maxsize=None)
 def setup_logger(name: str = "app", level: Optional[int] = None) -> logging.Logger:
     """
     设置日志记录器
@@ -15,7 +18,7 @@ def setup_logger(name: str = "app", level: Optional[int] = None) -> logging.Logg
         level: 日志级别，如果不提供则根据配置决定
     
     Returns:
-        配置好的日志记录器
+        配置好的日志记录器（同一 (name, level) 只配置一次，之后直接返回缓存的实例）
     """
     if level is None:
         level = logging.DEBUG if settings.VERBOSE else logging.INFO